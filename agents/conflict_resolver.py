@@ -1,35 +1,27 @@
 import os
 import sys
 import config
-from dotenv import load_dotenv
-from utils.tracing import setup_tracing
-from langsmith import Client
 from typing import Dict, List, Tuple
 from agents.state import SchedulerState
 from utils.llm import get_llm
+from utils.conflict_index import ConflictIndex, INVALID_SLOT
+from utils.conflict_repair import RepairSolver
+from utils.scheduling_engine import NO_CAPACITY_NOTE
+from utils.structured_output import stream_json_array, validate_slot
+from utils.time_slots import Schedule, format_day, parse_date
 from datetime import datetime, timedelta
 import json
 
 
-load_dotenv()
-
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler-new"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-
-try:
-    client = Client()
-except:
-    pass
-
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 
 
 class ConflictResolverAgent:
     
-    def __init__(self):
-        self.llm = get_llm(temperature=0.2)
+    def __init__(self, model=None):
+        self.llm = get_llm(temperature=0.2, model=model)
+        self.repair_solver = RepairSolver()
     
     def check_conflicts(self, state: SchedulerState) -> Dict:
         state["messages"].append("Conflict Checker: Analyzing schedule for conflicts...")
@@ -42,19 +34,7 @@ class ConflictResolverAgent:
             state["needs_conflict_resolution"] = False
             return state
         
-        conflicts = []
-        
-        overlaps = self._detect_time_overlaps(schedule)
-        if overlaps:
-            conflicts.extend(overlaps)
-        
-        deadline_conflicts = self._detect_deadline_violations(schedule, state.get("extracted_tasks", []))
-        if deadline_conflicts:
-            conflicts.extend(deadline_conflicts)
-        
-        duration_issues = self._detect_duration_issues(schedule)
-        if duration_issues:
-            conflicts.extend(duration_issues)
+        conflicts = self._find_conflicts(schedule, state.get("extracted_tasks", []))
         
         state["conflicts"] = conflicts
         
@@ -80,7 +60,24 @@ class ConflictResolverAgent:
             state["messages"].append("   Nothing to resolve")
             return state
         
-        resolution = self._resolve_with_llm(schedule, conflicts, state)
+        repair = self.repair_solver.repair(schedule, state.get("extracted_tasks", []))
+        state["messages"].append(
+            f"   Local repair moved {repair.moved} slot(s) and split {repair.split} long session(s)"
+        )
+        
+        # Sessions the engine could only place past their deadline cannot be
+        # moved earlier, by the repair or by the LLM; they stay reported
+        remaining = self._find_conflicts(repair.schedule, state.get("extracted_tasks", []), include_placed_late=False)
+        
+        if not remaining:
+            state["schedule"] = repair.schedule
+            state["conflicts"] = self._find_conflicts(repair.schedule, state.get("extracted_tasks", []))
+            state["needs_conflict_resolution"] = False
+            state["messages"].append("Resolved conflicts, updated schedule")
+            return state
+        
+        state["messages"].append(f"   {len(remaining)} conflict(s) left, asking LLM about affected days only")
+        resolution = self._resolve_with_llm(repair.schedule, remaining, state)
         
         if resolution:
             state["schedule"] = resolution
@@ -88,84 +85,118 @@ class ConflictResolverAgent:
             state["needs_conflict_resolution"] = False
             state["messages"].append(f"Resolved conflicts, updated schedule")
         else:
+            state["schedule"] = repair.schedule
+            state["conflicts"] = remaining
             state["messages"].append("Could not fully resolve conflicts")
         
         return state
     
-    def _detect_time_overlaps(self, schedule: List[Dict]) -> List[str]:
+    def _find_conflicts(self, schedule: List[Dict], tasks: List[Dict], include_placed_late: bool = True) -> List[str]:
+        # Parse the slots once and share them between the detectors
+        slots = Schedule.parse(schedule)
         conflicts = []
         
-        sorted_schedule = sorted(schedule, key=lambda x: (x['date'], x['time_slot']))
+        overlaps = self._detect_time_overlaps(slots)
+        if overlaps:
+            conflicts.extend(overlaps)
+        
+        deadline_conflicts = self._detect_deadline_violations(slots, tasks, include_placed_late)
+        if deadline_conflicts:
+            conflicts.extend(deadline_conflicts)
         
-        for i in range(len(sorted_schedule) - 1):
-            current = sorted_schedule[i]
-            next_item = sorted_schedule[i + 1]
-            
-            if current['date'] == next_item['date']:
-                try:
-                    current_end = current['time_slot'].split(' - ')[1]
-                    next_start = next_item['time_slot'].split(' - ')[0]
-                    
-                    if current_end > next_start:
-                        conflicts.append(
-                            f"Overlap on {current['date']}: "
-                            f"{current['task_name']} ({current['time_slot']}) and "
-                            f"{next_item['task_name']} ({next_item['time_slot']})"
-                        )
-                except:
-                    pass
+        duration_issues = self._detect_duration_issues(slots)
+        if duration_issues:
+            conflicts.extend(duration_issues)
         
         return conflicts
     
-    def _detect_deadline_violations(self, schedule: List[Dict], tasks: List[Dict]) -> List[str]:
-        """Detect tasks scheduled after their deadline."""
+    def _detect_time_overlaps(self, slots: Schedule) -> List[str]:
+        """Detect overlaps, double bookings, missing breaks and unparseable slots."""
+        index = ConflictIndex(slots, break_minutes=config.BREAK_MINUTES)
+        return [conflict.message for conflict in index.conflicts()]
+    
+    def _task_deadlines(self, tasks: List[Dict]) -> Dict[str, Tuple[int, str]]:
+        deadlines = {}
+        for task in tasks:
+            deadline = parse_date(task.get('deadline'))
+            if deadline:
+                deadlines[task['task_name']] = (deadline.toordinal(), task['deadline'])
+        return deadlines
+    
+    def _detect_deadline_violations(self, slots: Schedule, tasks: List[Dict],
+                                    include_placed_late: bool = True) -> List[str]:
+        """Detect tasks scheduled after their deadline (optionally not those the engine placed late)."""
         conflicts = []
         
-        task_deadlines = {task['task_name']: task['deadline'] for task in tasks}
+        task_deadlines = self._task_deadlines(tasks)
         
-        for slot in schedule:
-            task_name = slot['task_name']
-            scheduled_date = slot['date']
+        for i in range(len(slots)):
+            task_name = slots.task_names[slots.task[i]]
             
             if task_name in task_deadlines:
-                deadline = task_deadlines[task_name]
+                deadline_day, deadline = task_deadlines[task_name]
                 
-                try:
-                    sched_dt = datetime.strptime(scheduled_date, '%Y-%m-%d')
-                    dead_dt = datetime.strptime(deadline, '%Y-%m-%d')
-                    
-                    if sched_dt > dead_dt:
-                        conflicts.append(
-                            f"Deadline violation: {task_name} scheduled on {scheduled_date} "
-                            f"but due on {deadline}"
-                        )
-                except:
-                    pass
+                if slots.day[i] > deadline_day:
+                    if not include_placed_late and NO_CAPACITY_NOTE in slots.notes[i]:
+                        continue
+                    conflicts.append(
+                        f"Deadline violation: {task_name} scheduled on {format_day(slots.day[i])} "
+                        f"but due on {deadline}"
+                    )
         
         return conflicts
     
-    def _detect_duration_issues(self, schedule: List[Dict]) -> List[str]:
+    def _detect_duration_issues(self, slots: Schedule) -> List[str]:
         """Detect unrealistic durations (too long)."""
         conflicts = []
         
-        for slot in schedule:
-            duration = slot.get('duration_hours', 0)
+        for slot in slots:
+            duration = slot.duration_hours
             
-            if duration > 5:
+            if duration > config.MAX_SLOT_HOURS:
                 conflicts.append(
-                    f"Duration issue: {slot['task_name']} scheduled for {duration}h "
+                    f"Duration issue: {slot.task_name} scheduled for {duration}h "
                     f"(consider breaking into smaller sessions)"
                 )
         
         return conflicts
     
+    def _conflict_neighbourhood(self, schedule: List[Dict], tasks: List[Dict]) -> List[int]:
+        """Indices of slots on days that still have conflicts (plus unparseable slots)."""
+        slots = Schedule.parse(schedule)
+        index = ConflictIndex(slots, break_minutes=config.BREAK_MINUTES)
+        days = set()
+        invalid = set()
+        
+        for conflict in index.conflicts():
+            if conflict.date and conflict.kind != INVALID_SLOT:
+                days.add(parse_date(conflict.date).toordinal())
+            else:
+                invalid.update(conflict.slot_indices)
+        
+        task_deadlines = self._task_deadlines(tasks)
+        for slot in slots:
+            deadline = task_deadlines.get(slot.task_name)
+            late = deadline and slot.day > deadline[0] and NO_CAPACITY_NOTE not in (slot.notes or "")
+            if late or slot.duration_hours > config.MAX_SLOT_HOURS:
+                days.add(slot.day)
+        
+        affected = invalid | {slots.source[i] for day in days for i in slots.on_day(day)}
+        return sorted(affected)
+    
     def _resolve_with_llm(self, schedule: List[Dict], conflicts: List[str], state: SchedulerState) -> List[Dict]:
-        """Use LLM to resolve conflicts intelligently."""
+        """Use LLM to resolve conflicts, sending only the slots on affected days."""
+        
+        affected = self._conflict_neighbourhood(schedule, state.get("extracted_tasks", []))
+        if not affected:
+            return None
+        neighbourhood = [schedule[i] for i in affected]
         
-        prompt = f"""You are a scheduling conflict resolver. Fix the following conflicts in the schedule.
+        prompt = f"""You are a scheduling conflict resolver. Fix the following conflicts in this part of a schedule.
+The slots below are the only ones on the affected days; the rest of the schedule is fixed.
 
-CURRENT SCHEDULE:
-{json.dumps(schedule, indent=2)}
+AFFECTED SLOTS:
+{json.dumps(neighbourhood, separators=(',', ':'))}
 
 CONFLICTS DETECTED:
 {chr(10).join(f'- {c}' for c in conflicts)}
@@ -189,21 +220,17 @@ OUTPUT FORMAT (return ONLY valid JSON array):
   }}
 ]
 
-Return ONLY the resolved schedule as JSON array, no other text.
+Return ONLY the resolved slots as JSON array, no other text.
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            
-            import re
-            content = response.content
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            
-            if json_match:
-                resolved = json.loads(json_match.group())
-                return resolved
-            else:
+            resolved = stream_json_array(self.llm, prompt, validate_slot)
+            if not resolved:
                 return None
+            
+            affected_set = set(affected)
+            untouched = [slot for i, slot in enumerate(schedule) if i not in affected_set]
+            return untouched + resolved
         
         except Exception as e:
             state["messages"].append(f"Error resolving conflicts: {e}")
@@ -1,50 +1,149 @@
 import os
 import sys
-from dotenv import load_dotenv
-from langsmith import Client
 import config
-from agents.state import SchedulerState, create_initial_state
+from agents.state import SchedulerState, create_initial_state, create_update_state
 from agents.task_extractor import TaskExtractorAgent
 from agents.scheduler_agent import SchedulerAgent
 from agents.conflict_resolver import ConflictResolverAgent
-from langgraph.graph import StateGraph, END
-from typing import Dict
+from utils.cancellation import Cancelled, cancel_scope, check_cancelled
+from utils.metrics import get_metrics
+from utils.time_slots import Schedule
+from utils.tracing import setup_tracing
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import threading
 
 
-load_dotenv()
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-os.environ["LANGCHAIN_LANGGRAPH_TRACING"] = "true"
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-try:
-    client = Client()
-    print("LangSmith tracing initialized")
-except Exception as e:
-    print(f"LangSmith warning: {e}")
 
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+# Progress (percent) reported once each node has finished, plus a UI label
+NODE_PROGRESS = {
+    "extract_tasks": (30, "Tasks extracted"),
+    "enrich_with_rag": (50, "Enriched with past patterns"),
+    "schedule": (70, "Schedule created"),
+    "check_conflicts": (80, "Conflicts checked"),
+    "resolve_conflicts": (90, "Conflicts resolved"),
+    "finalize": (100, "Complete!"),
+}
+
+
+def thread_config(thread_id: str) -> Dict:
+    """Run config that stores every node's output under ``thread_id`` in the checkpointer."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def resume_run(compiled, thread_id: str) -> SchedulerState:
+    """Continue a failed or interrupted run from its last completed node."""
+    return compiled.invoke(None, thread_config(thread_id))
+
+
+def discard_run(compiled, thread_id: Optional[str]):
+    """Delete the checkpoints of a run that will not be resumed or replayed."""
+    if compiled.checkpointer is not None and thread_id:
+        compiled.checkpointer.delete_thread(thread_id)
+
+
+def replay_from(compiled, thread_id: str, node: str, values: Optional[Dict] = None) -> SchedulerState:
+    """Re-run ``node`` and everything after it, reusing the checkpointed state before it.
+    
+    Use after changing e.g. the scheduling engine's parameters: with
+    ``node="schedule"`` extraction and RAG enrichment are not repeated.
+    ``values`` are applied to that state first. The replay is a new branch
+    of the same thread, so the original run stays in its history.
+    """
+    for snapshot in compiled.get_state_history(thread_config(thread_id)):
+        if snapshot.next == (node,):
+            break
+    else:
+        raise ValueError(f"No checkpoint before node {node!r} in thread {thread_id!r}")
+    
+    run_config = snapshot.config
+    if values:
+        # Attributed to the node that produced this checkpoint, so ``node`` still runs next
+        run_config = compiled.update_state(run_config, values)
+    return compiled.invoke(None, run_config)
+
+
+async def astream_progress(
+    compiled,
+    initial_state: Optional[SchedulerState],
+    cancel_event: Optional[threading.Event] = None,
+    config: Optional[Dict] = None
+) -> AsyncIterator[Dict]:
+    """Run the compiled graph asynchronously, yielding an event after every node.
+    
+    Each event has ``node``, ``progress``, ``label`` and ``state`` (the full
+    state after that node), so callers can show partial results such as the
+    extracted tasks before scheduling has finished. While extraction runs,
+    an ``extract_tasks`` event with ``progress`` None and a ``task`` key is
+    yielded for every task as soon as it has been parsed. Setting
+    ``cancel_event`` (from any thread) stops the run: no further node
+    starts, file extraction and queued LLM chunk calls stop, and a final
+    event with ``node`` set to ``"cancelled"`` is yielded. An LLM call
+    already in flight still completes.
+    
+    ``config`` is passed to the graph (see ``thread_config``); with a
+    checkpointed graph, ``initial_state=None`` resumes that thread.
+    """
+    node = None
+    latest = initial_state
+    if cancel_event is not None:
+        # Seen by the nodes through _timed
+        config = dict(config or {})
+        config["configurable"] = {**config.get("configurable", {}), "cancel_event": cancel_event}
+    stream = compiled.astream(initial_state, config, stream_mode=["updates", "values", "custom"])
+    try:
+        async for mode, chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                raise Cancelled()
+            
+            if mode == "custom":
+                if isinstance(chunk, dict) and "task" in chunk:
+                    yield {
+                        "node": "extract_tasks", "progress": None,
+                        "label": f"Found task: {chunk['task']['task_name']}",
+                        "state": latest, "task": chunk["task"],
+                    }
+                continue
+            
+            if mode == "updates":
+                node = next(iter(chunk), None)
+                continue
+            
+            latest = chunk
+            if node is not None:
+                progress, label = NODE_PROGRESS.get(node, (None, node))
+                yield {"node": node, "progress": progress, "label": label, "state": chunk}
+                node = None
+    except Cancelled:
+        yield {"node": "cancelled", "progress": None, "label": "Cancelled", "state": latest}
+    finally:
+        await stream.aclose()
 
 
 class SchedulerGraph:
     
-    def __init__(self):
+    def __init__(self, model=None, persist_directory="./data/chroma_db"):
+        from langgraph.graph import StateGraph
+        
+        setup_tracing()
         self.graph = StateGraph(SchedulerState)
         
-        self.task_extractor = TaskExtractorAgent()
-        self.scheduler = SchedulerAgent()
-        self.conflict_resolver = ConflictResolverAgent()
+        self.task_extractor = TaskExtractorAgent(model=model)
+        self.scheduler = SchedulerAgent(model=model, persist_directory=persist_directory)
+        self.conflict_resolver = ConflictResolverAgent(model=model)
         
         self._build_graph()
     
     def _build_graph(self):
+        from langgraph.graph import END
         
-        self.graph.add_node("extract_tasks", self.extract_tasks_node)
-        self.graph.add_node("enrich_with_rag", self.enrich_with_rag_node)
-        self.graph.add_node("schedule", self.schedule_node)
-        self.graph.add_node("check_conflicts", self.check_conflicts_node)
-        self.graph.add_node("resolve_conflicts", self.resolve_conflicts_node)
-        self.graph.add_node("finalize", self.finalize_node)
+        self.graph.add_node("extract_tasks", self._timed("extract_tasks", self.extract_tasks_node))
+        self.graph.add_node("enrich_with_rag", self._timed("enrich_with_rag", self.enrich_with_rag_node))
+        self.graph.add_node("schedule", self._timed("schedule", self.schedule_node))
+        self.graph.add_node("check_conflicts", self._timed("check_conflicts", self.check_conflicts_node))
+        self.graph.add_node("resolve_conflicts", self._timed("resolve_conflicts", self.resolve_conflicts_node))
+        self.graph.add_node("finalize", self._timed("finalize", self.finalize_node))
         
         self.graph.set_entry_point("extract_tasks")
         self.graph.add_edge("extract_tasks", "enrich_with_rag")
@@ -65,8 +164,34 @@ class SchedulerGraph:
         
         print("Graph built with all 3 agents")
     
+    @staticmethod
+    def _timed(name: str, node: Callable[[SchedulerState], Dict]):
+        """Wrap ``node`` in a metrics span and the run's cancel scope.
+        
+        Spans of one thread share its thread_id as trace id; a cancelled run
+        does not start the node.
+        """
+        from langchain_core.runnables import RunnableConfig
+        
+        def timed_node(state: SchedulerState, config: RunnableConfig) -> Dict:
+            configurable = (config or {}).get("configurable", {})
+            thread_id = configurable.get("thread_id")
+            with cancel_scope(configurable.get("cancel_event")), \
+                    get_metrics().span(name, "node", trace_id=thread_id) as span:
+                check_cancelled()
+                update = node(state)
+                span.set(tasks=len(update.get("extracted_tasks") or []), slots=len(update.get("schedule") or []))
+                return update
+        
+        timed_node.__name__ = name
+        return timed_node
+    
     def extract_tasks_node(self, state: SchedulerState) -> Dict:
-        return self.task_extractor.process(state)
+        from langgraph.config import get_stream_writer
+        
+        # Each task is pushed to "custom" stream subscribers as soon as it is parsed
+        writer = get_stream_writer()
+        return self.task_extractor.process(state, on_task=lambda task: writer({"task": task}))
     
     def enrich_with_rag_node(self, state: SchedulerState) -> Dict:
         return self.scheduler.enrich_with_rag(state)
@@ -85,11 +210,11 @@ class SchedulerGraph:
         state["current_step"] = "finalize"
         state["status"] = "success"
         
-        schedule = state.get("schedule", [])
-        if schedule:
+        schedule = Schedule.parse(state.get("schedule", []))
+        if len(schedule):
             formatted = "**Your Schedule:**\n\n"
             for slot in schedule:
-                formatted += f"• {slot['date']} {slot['time_slot']}: {slot['task_name']} ({slot['duration_hours']}h)\n"
+                formatted += f"• {slot.date} {slot.time_slot}: {slot.task_name} ({slot.duration_hours}h)\n"
             state["final_schedule"] = formatted
         
         return state
@@ -99,7 +224,28 @@ class SchedulerGraph:
             return "resolve"
         return "finalize"
     
-    def compile(self):
-        app = self.graph.compile()
+    def compile(self, checkpointer=None):
+        app = self.graph.compile(checkpointer=checkpointer)
         app.name = "Smart-Scheduler-Multi-Agent"
-        return app
\ No newline at end of file
+        return app
+    
+    def update(
+        self,
+        previous_state: SchedulerState,
+        raw_input: str = "",
+        uploaded_file_paths: Optional[List[str]] = None,
+        compiled=None,
+        thread_id: Optional[str] = None
+    ) -> SchedulerState:
+        """Re-run the graph after the inputs changed, redoing only what the change affects.
+        
+        Inputs whose contents are unchanged since ``previous_state`` are not
+        extracted again, unchanged tasks skip RAG enrichment and keep their
+        slots, and only new or edited tasks are placed around them.
+        ``thread_id`` is required when ``compiled`` has a checkpointer.
+        """
+        compiled = compiled or self.compile()
+        return compiled.invoke(
+            create_update_state(previous_state, raw_input, uploaded_file_paths),
+            thread_config(thread_id) if thread_id else None
+        )
\ No newline at end of file
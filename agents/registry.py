@@ -0,0 +1,141 @@
+# agents/registry.py
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import config
+from agents.graph import SchedulerGraph
+from utils.checkpoints import get_checkpointer
+
+
+DEFAULT_PERSIST_DIRECTORY = "./data/chroma_db"
+
+
+class _GraphEntry:
+
+    def __init__(self, graph: SchedulerGraph, compiled):
+        self.graph = graph
+        self.compiled = compiled
+        self.built_at = time.time()
+        self.build_seconds = 0.0
+        self.hits = 0
+
+
+class GraphRegistry:
+    """Process-wide cache of compiled scheduler graphs.
+
+    Building a SchedulerGraph loads the embedding model, opens Chroma and
+    creates every LLM client, so it is done once per configuration and the
+    same compiled graph is handed to every caller (and Streamlit session).
+    Unless CHECKPOINT_ENABLED is off, the graphs are compiled with the SQLite
+    checkpointer, so every run needs a ``thread_id`` (see ``thread_config``).
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, _GraphEntry] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Tuple, threading.Lock] = {}
+        # Bumped by every invalidate, so builds started before it are not cached
+        self._generation = 0
+
+    def _key(self, model: Optional[str], persist_directory: Optional[str]) -> Tuple:
+        return (model or config.GROQ_MODEL, persist_directory or DEFAULT_PERSIST_DIRECTORY)
+
+    def get_entry(self, model: Optional[str] = None, persist_directory: Optional[str] = None) -> _GraphEntry:
+        key = self._key(model, persist_directory)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.hits += 1
+                return entry
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Build outside the registry lock so other configurations are not blocked,
+        # but only once per key even if several sessions ask at the same time.
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.hits += 1
+                    return entry
+                generation = self._generation
+
+            try:
+                started = time.perf_counter()
+                graph = SchedulerGraph(model=key[0], persist_directory=key[1])
+                entry = _GraphEntry(graph, graph.compile(checkpointer=get_checkpointer()))
+                entry.build_seconds = time.perf_counter() - started
+                entry.hits = 1
+            finally:
+                with self._lock:
+                    if self._build_locks.get(key) is build_lock:
+                        del self._build_locks[key]
+
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[key] = entry
+                else:
+                    # Invalidated while building: serve this caller, build afresh for the next
+                    print(f"Graph registry: {key} was invalidated during its build; not cached")
+            print(f"Graph registry: built graph for {key} in {entry.build_seconds:.2f}s")
+            return entry
+
+    def get_graph(self, model: Optional[str] = None, persist_directory: Optional[str] = None) -> SchedulerGraph:
+        return self.get_entry(model, persist_directory).graph
+
+    def get_compiled(self, model: Optional[str] = None, persist_directory: Optional[str] = None):
+        return self.get_entry(model, persist_directory).compiled
+
+    def warm_up(self, model: Optional[str] = None, persist_directory: Optional[str] = None) -> float:
+        """Build (if needed) and return the build time in seconds."""
+        return self.get_entry(model, persist_directory).build_seconds
+
+    def invalidate(self, model: Optional[str] = None, persist_directory: Optional[str] = None,
+                   all_entries: bool = False) -> int:
+        with self._lock:
+            self._generation += 1
+            if all_entries:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+
+            key = self._key(model, persist_directory)
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def health(self) -> Dict:
+        with self._lock:
+            entries = list(self._entries.items())
+
+        graphs = []
+        healthy = True
+        for (model, persist_directory), entry in entries:
+            info = {
+                "model": model,
+                "persist_directory": persist_directory,
+                "age_seconds": round(time.time() - entry.built_at, 1),
+                "build_seconds": round(entry.build_seconds, 2),
+                "hits": entry.hits,
+                "vectorstore_ok": True,
+            }
+            try:
+                info["embedding_cache"] = entry.graph.scheduler.rag.embeddings.stats()
+                entry.graph.scheduler.rag.count()
+            except Exception as e:
+                info["vectorstore_ok"] = False
+                info["error"] = str(e)
+                healthy = False
+            graphs.append(info)
+
+        return {"healthy": healthy, "graphs": graphs}
+
+
+_registry = GraphRegistry()
+
+
+def get_registry() -> GraphRegistry:
+    return _registry
+
+
+def get_compiled_graph(model: Optional[str] = None, persist_directory: Optional[str] = None):
+    return _registry.get_compiled(model, persist_directory)
@@ -1,59 +1,63 @@
 import os
 import sys
 import config
-from dotenv import load_dotenv
-from utils.tracing import setup_tracing
-from langsmith import Client
 from typing import Dict, List
-from agents.state import SchedulerState, Task
-from utils.rag_manager import RAGManager
+from agents.state import SchedulerState
+from utils.rag_manager import DEFAULT_TENANT, RAGManager
 from utils.llm import get_llm
+from utils.scheduling_engine import SchedulingEngine, preferred_windows
+from utils.structured_output import stream_json_array, validate_annotation
 from datetime import datetime, timedelta
-import json
 
 
-load_dotenv()
-
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler-new"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-
-try:
-    client = Client()
-except:
-    pass
-
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 
 
-
-
-
-
 class SchedulerAgent:
     
-    def __init__(self):
-        self.rag = RAGManager()
-        self.llm = get_llm(temperature=0.3) 
+    def __init__(self, model=None, persist_directory="./data/chroma_db"):
+        self.rag = RAGManager(persist_directory=persist_directory)
+        self.llm = get_llm(temperature=0.3, model=model)
+        self.engine = SchedulingEngine()
+        self.annotate_with_llm = config.SCHEDULER_LLM_ANNOTATE
     
     def enrich_with_rag(self, state: SchedulerState) -> Dict:
         state["messages"].append("RAG Enrichment Agent: Analyzing past patterns...")
         state["current_step"] = "enrich_with_rag"
         
-        tasks = state.get("extracted_tasks", [])
+        # Tasks carried over unchanged from a previous run were enriched then
+        tasks = [task for task in state.get("extracted_tasks", []) if task.get('status', 'pending') == 'pending']
         
         if not tasks:
             state["messages"].append("No tasks to enrich")
             return state
         
-        # Retrieve similar past tasks for each task
-        all_similar_tasks = []
+        all_similar_tasks = list(state.get("similar_past_tasks") or [])
         
+        # Courses and task types seen often enough are adjusted from precomputed aggregates
+        tenant = state.get("tenant_id") or DEFAULT_TENANT
+        aggregates = self.rag.stats.load(tenant)
+        unseen = []
         for task in tasks:
-            task_desc = f"{task['task_name']} {task.get('course', '')}"
-            similar = self.rag.retrieve_similar_tasks(task_desc, k=2)
+            found = self.rag.stats.lookup(aggregates, task.get('course'), task['task_name'], config.TASK_STATS_MIN_COUNT)
+            if found is None:
+                unseen.append(task)
+                continue
             
+            dimension, aggregate = found
+            adjusted = round(task['estimated_hours'] * aggregate.mean, 1)
+            task['estimated_hours'] = adjusted
+            state["messages"].append(
+                f"   📊 Adjusted {task['task_name']}: {adjusted}h "
+                f"(x{aggregate.mean:.2f} from {aggregate.count} past tasks by {dimension.replace('_', ' and ')})"
+            )
+        
+        # The rest fall back to similar past tasks, retrieved in one batched query
+        descriptions = [f"{task['task_name']} {task.get('course', '')}" for task in unseen]
+        similar_per_task = self.rag.retrieve_similar_tasks_batch(descriptions, k=2, tenant_id=state.get("tenant_id"))
+        
+        for task, similar in zip(unseen, similar_per_task):
             if similar:
                 all_similar_tasks.extend(similar)
                 
@@ -68,11 +72,12 @@ class SchedulerAgent:
                         f"   📊 Adjusted {task['task_name']}: {adjusted}h (based on similar tasks)"
                     )
         
-        state["similar_past_tasks"] = all_similar_tasks
+        # Results carried over from earlier runs come back for the same stored entries
+        state["similar_past_tasks"] = list({similar['content']: similar for similar in all_similar_tasks}.values())
         
         # Get recommended time slots
-        recommended_slots = self.rag.get_best_time_slots("study", k=3)
-        state["recommended_time_slots"] = recommended_slots
+        if not state.get("recommended_time_slots"):
+            state["recommended_time_slots"] = self.rag.get_best_time_slots("study", k=3, tenant_id=state.get("tenant_id"))
         
         state["messages"].append(f"✅ RAG enrichment complete with {len(all_similar_tasks)} similar tasks")
         
@@ -88,82 +93,80 @@ class SchedulerAgent:
             state["messages"].append("No tasks to schedule")
             return state
         
-        tasks_summary = self._format_tasks_for_llm(tasks)
+        # Slots of tasks unchanged since the previous run stay where they are
+        pinned = state.get("pinned_slots") or []
+        pinned_tasks = {(slot['task_name'], slot.get('course')) for slot in pinned}
+        to_place = [task for task in tasks if (task['task_name'], task.get('course')) not in pinned_tasks]
+        
+        try:
+            new_slots = self.engine.schedule(
+                to_place, busy=pinned, preferred=preferred_windows(state.get("recommended_time_slots", []))
+            )
+        except Exception as e:
+            state["messages"].append(f"Error creating schedule: {e}")
+            state["schedule"] = []
+            return state
+        
+        if self.annotate_with_llm and new_slots:
+            self._annotate_with_llm(new_slots, state)
+        
+        schedule = sorted(pinned + new_slots, key=lambda slot: (slot['date'], slot['time_slot']))
+        state["schedule"] = schedule
+        if pinned:
+            state["messages"].append(
+                f"Kept {len(pinned)} pinned slot(s), placed {len(new_slots)} new slot(s) for {len(to_place)} task(s)"
+            )
+        state["messages"].append(f"Created schedule with {len(schedule)} time slots")
+        
+        first_slots = {}
+        for slot in schedule:
+            first_slots.setdefault(slot['task_name'], f"{slot['date']} {slot['time_slot']}")
+        
+        for task in tasks:
+            task['status'] = 'scheduled'
+            task['scheduled_time'] = first_slots.get(task['task_name'])
+        
+        for i, slot in enumerate(schedule, 1):
+            state["messages"].append(
+                f"   {i}. {slot['date']} {slot['time_slot']}: {slot['task_name']}"
+            )
+        
+        return state
+    
+    def _annotate_with_llm(self, schedule: List[Dict], state: SchedulerState):
+        """Ask the LLM to explain the placements; the slots themselves are never changed."""
+        slots_summary = "\n".join(
+            f"{i}. {slot['date']} {slot['time_slot']}: {slot['task_name']} ({slot['priority']})"
+            for i, slot in enumerate(schedule)
+        )
         rag_context = self._format_rag_context(state)
         
-        prompt = f"""You are an intelligent scheduling assistant. Create an optimal weekly schedule for the following tasks.
+        prompt = f"""You are an intelligent scheduling assistant. The following timetable has already been created.
+Write a short note (max 15 words) for each slot explaining why it is a good time for that task.
 
-TASKS TO SCHEDULE:
-{tasks_summary}
+SCHEDULE:
+{slots_summary}
 
 PRODUCTIVITY INSIGHTS (from past data):
 {rag_context}
 
-SCHEDULING GUIDELINES:
-1. Consider task priorities (High priority tasks get better time slots)
-2. Use recommended high-productivity time slots when available
-3. Break large tasks (>3 hours) into multiple sessions
-4. Add 15-min breaks between tasks
-5. Consider deadlines - schedule urgent tasks earlier
-6. Today's date: {datetime.now().strftime('%Y-%m-%d')}
-
 OUTPUT FORMAT (return ONLY valid JSON array):
 [
-  {{
-    "task_name": "Task name",
-    "date": "YYYY-MM-DD",
-    "time_slot": "HH:MM - HH:MM",
-    "duration_hours": 2.0,
-    "priority": "High",
-    "notes": "Why this time slot"
-  }}
+  {{"index": 0, "notes": "Why this time slot"}}
 ]
 
 Return ONLY the JSON array, no other text.
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            
-            import re
-            content = response.content
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            
-            if json_match:
-                schedule = json.loads(json_match.group())
-                state["schedule"] = schedule
-                
-                state["messages"].append(f"Created schedule with {len(schedule)} time slots")
-                
-                for task in tasks:
-                    task['status'] = 'scheduled'
-                
-                for i, slot in enumerate(schedule, 1):
-                    state["messages"].append(
-                        f"   {i}. {slot['date']} {slot['time_slot']}: {slot['task_name']}"
-                    )
-            
-            else:
-                state["messages"].append("Failed to parse schedule from LLM")
-                state["schedule"] = []
+            # Notes are cosmetic, so an invalid one is dropped rather than re-requested
+            for item in stream_json_array(self.llm, prompt, validate_annotation, repair=False):
+                index = item['index']
+                if 0 <= index < len(schedule):
+                    schedule[index]['notes'] = f"{schedule[index]['notes']}. {item['notes']}"
         
         except Exception as e:
-            state["messages"].append(f"Error creating schedule: {e}")
-            state["schedule"] = []
-        
-        return state
-    
-    def _format_tasks_for_llm(self, tasks: List[Task]) -> str:
-        lines = []
-        for i, task in enumerate(tasks, 1):
-            lines.append(
-                f"{i}. {task['task_name']}\n"
-                f"   Course: {task.get('course', 'General')}\n"
-                f"   Deadline: {task['deadline']}\n"
-                f"   Estimated Duration: {task['estimated_hours']} hours\n"
-                f"   Priority: {task['priority']}"
-            )
-        return "\n\n".join(lines)
+            state["messages"].append(f"Could not annotate schedule: {e}")
     
     def _format_rag_context(self, state: SchedulerState) -> str:
         lines = []
@@ -4,7 +4,6 @@ from datetime import datetime
 import operator
 
 
-
 class Task(TypedDict):
     task_name: str
     deadline: str
@@ -18,9 +17,20 @@ class Task(TypedDict):
 class SchedulerState(TypedDict):
     raw_input: str
     uploaded_file_paths: Optional[List[str]]
+    # Whose RAG memory is used; None is the default tenant
+    tenant_id: Optional[str]
     
     extracted_tasks: List[Task]
     
+    # Incremental updates: digest and raw extracted tasks per input ("raw_input"
+    # or a file path), the previous run's tasks and schedule, and the slots
+    # of unchanged tasks that are kept as they are
+    source_digests: Dict[str, str]
+    tasks_by_source: Dict[str, List[Dict]]
+    previous_tasks: List[Task]
+    previous_schedule: List[Dict]
+    pinned_slots: List[Dict]
+    
     similar_past_tasks: List[Dict]
     recommended_time_slots: List[Dict]
     
@@ -38,12 +48,19 @@ class SchedulerState(TypedDict):
 
 def create_initial_state(
     raw_input: str = "",
-    uploaded_file_paths: Optional[List[str]] = None
+    uploaded_file_paths: Optional[List[str]] = None,
+    tenant_id: Optional[str] = None
 ) -> SchedulerState:
     return SchedulerState(
         raw_input=raw_input,
         uploaded_file_paths=uploaded_file_paths,
+        tenant_id=tenant_id,
         extracted_tasks=[],
+        source_digests={},
+        tasks_by_source={},
+        previous_tasks=[],
+        previous_schedule=[],
+        pinned_slots=[],
         similar_past_tasks=[],
         recommended_time_slots=[],
         schedule=[],
@@ -53,4 +70,28 @@ def create_initial_state(
         needs_conflict_resolution=False,
         final_schedule=None,
         status="initialized"
-    )
\ No newline at end of file
+    )
+
+
+def create_update_state(
+    previous_state: SchedulerState,
+    raw_input: str = "",
+    uploaded_file_paths: Optional[List[str]] = None,
+    tenant_id: Optional[str] = None
+) -> SchedulerState:
+    """Initial state for re-running the graph after the inputs changed.
+    
+    Unchanged inputs are not extracted again, and tasks that did not change
+    keep their slots from ``previous_state`` (normally a run's final state).
+    Without ``tenant_id`` the previous run's tenant is kept.
+    """
+    state = create_initial_state(raw_input, uploaded_file_paths, tenant_id or previous_state.get("tenant_id"))
+    state.update(
+        source_digests=dict(previous_state.get("source_digests") or {}),
+        tasks_by_source=dict(previous_state.get("tasks_by_source") or {}),
+        previous_tasks=[dict(task) for task in previous_state.get("extracted_tasks") or []],
+        previous_schedule=[dict(slot) for slot in previous_state.get("schedule") or []],
+        similar_past_tasks=list(previous_state.get("similar_past_tasks") or []),
+        recommended_time_slots=list(previous_state.get("recommended_time_slots") or []),
+    )
+    return state
\ No newline at end of file
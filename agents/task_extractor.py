@@ -1,106 +1,161 @@
 import os
-from dotenv import load_dotenv
 import config
-from utils.tracing import setup_tracing
-from langsmith import Client
 import sys
-from typing import Dict, List
+import hashlib
+from typing import Callable, Dict, List, Optional
 from agents.state import SchedulerState, Task
+from utils.chunking import merge_tasks
 from utils.document_processor import DocumentProcessor
+from utils.extraction_cache import file_digest
 from utils.llm import get_llm
 from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-load_dotenv()
-
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler-new"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-
-try:
-    client = Client()
-except:
-    pass
-
-
-
-
-
 
 class TaskExtractorAgent:
     
-    def __init__(self):
-        self.doc_processor = DocumentProcessor()
-        self.llm = get_llm(temperature=0)
+    def __init__(self, model=None):
+        self.doc_processor = DocumentProcessor(model=model)
+        self.llm = get_llm(temperature=0, model=model)
+        # Optional callable receiving each per-file result as soon as it is ready
+        self.progress_callback = None
     
-    def process(self, state: SchedulerState) -> Dict:
+    def process(self, state: SchedulerState, on_task: Optional[Callable[[Dict], None]] = None) -> Dict:
         state["messages"].append("Task Extractor Agent: Starting extraction...")
         state["current_step"] = "extract_tasks"
         
-        all_text = ""
+        previous_digests = state.get("source_digests") or {}
+        previous_by_source = state.get("tasks_by_source") or {}
+        
+        # Inputs in prompt order; only new or changed ones are extracted again
+        order = []
+        digests = {}
+        texts = {}
+        tasks_by_source = {}
+        
+        def add_source(key: str, digest: str) -> bool:
+            order.append(key)
+            digests[key] = digest
+            if previous_digests.get(key) == digest and key in previous_by_source:
+                tasks_by_source[key] = previous_by_source[key]
+                return False
+            return True
         
         if state.get("raw_input"):
-            all_text += state["raw_input"] + "\n\n"
-            state["messages"].append(f"Processing text input ({len(state['raw_input'])} chars)")
+            digest = hashlib.sha256(state["raw_input"].encode("utf-8")).hexdigest()
+            if add_source("raw_input", digest):
+                texts["raw_input"] = state["raw_input"] + "\n\n"
+                state["messages"].append(f"Processing text input ({len(state['raw_input'])} chars)")
         
         if state.get("uploaded_file_paths"):
-            file_paths = state["uploaded_file_paths"]
+            file_paths = []
+            for path in state["uploaded_file_paths"]:
+                if not os.path.exists(path):
+                    state["messages"].append(f"File not found: {path}")
+                elif add_source(path, file_digest(path, "")):
+                    file_paths.append(path)
+            
             state["messages"].append(f"Processing {len(file_paths)} uploaded file(s)...")
+            labels = {"pdf": "PDF", "image": "image", "text": "text file"}
             
-            for idx, file_path in enumerate(file_paths, 1):
-                if os.path.exists(file_path):
-                    file_name = os.path.basename(file_path)
-                    
-                    if file_path.lower().endswith('.pdf'):
-                        state["messages"].append(f"[{idx}/{len(file_paths)}] Processing PDF: {file_name}...")
-                        pdf_text = self.doc_processor.process_pdf(file_path)
-                        all_text += f"\n\n--- Content from {file_name} ---\n\n" + pdf_text + "\n\n"
-                        
-                    elif file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        state["messages"].append(f"[{idx}/{len(file_paths)}] Processing image: {file_name}...")
-                        image_text = self.doc_processor.process_image_with_llm(file_path)
-                        all_text += f"\n\n--- Content from {file_name} ---\n\n" + image_text + "\n\n"
-                        
-                    elif file_path.lower().endswith('.txt'):
-                        state["messages"].append(f"[{idx}/{len(file_paths)}] Processing text file: {file_name}...")
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            all_text += f"\n\n--- Content from {file_name} ---\n\n" + f.read() + "\n\n"
-                            
-                    else:
-                        state["messages"].append(f"[{idx}/{len(file_paths)}] Unsupported file type: {file_name}")
+            for done, result in enumerate(self.doc_processor.iter_process_files(file_paths), 1):
+                prefix = f"[{done}/{len(file_paths)}]"
+                
+                if result["kind"] == "unsupported" or result["error"]:
+                    # Forget the digest so that the next update tries this file again
+                    digests.pop(result["path"], None)
+                
+                if result["kind"] == "unsupported":
+                    state["messages"].append(f"{prefix} Unsupported file type: {result['name']}")
+                elif result["error"]:
+                    state["messages"].append(f"{prefix} Error processing {result['name']}: {result['error']}")
                 else:
-                    state["messages"].append(f"File not found: {file_path}")
-
+                    state["messages"].append(
+                        f"{prefix} Processed {labels[result['kind']]}: {result['name']} ({len(result['text'])} chars)"
+                    )
+                    texts[result["path"]] = f"\n\n--- Content from {result['name']} ---\n\n" + result["text"] + "\n\n"
+                
+                if self.progress_callback:
+                    self.progress_callback(result)
         
-        if all_text.strip():
-            state["messages"].append(f"Analyzing {len(all_text)} characters of content...")
-            tasks = self.doc_processor.extract_tasks_from_text(all_text)
-            
-            extracted_tasks = []
-            for task_dict in tasks:
-                task = Task(
-                    task_name=task_dict.get('task_name', 'Unnamed Task'),
-                    deadline=task_dict.get('deadline', 'Not specified'),
-                    estimated_hours=float(task_dict.get('estimated_hours', 2)),
-                    priority=task_dict.get('priority', 'Medium'),
-                    course=task_dict.get('course'),
-                    scheduled_time=None,
-                    status='pending'
-                )
-                extracted_tasks.append(task)
-            
-            state["extracted_tasks"] = extracted_tasks
-            state["messages"].append(f"Extracted {len(extracted_tasks)} task(s)")
-            
-            for i, task in enumerate(extracted_tasks, 1):
-                state["messages"].append(
-                    f"   {i}. {task['task_name']} - Due: {task['deadline']} "
-                    f"({task['estimated_hours']}h, {task['priority']})"
-                )
+        if tasks_by_source:
+            state["messages"].append(f"Reusing tasks from {len(tasks_by_source)} unchanged input(s)")
+            if on_task:
+                for tasks in tasks_by_source.values():
+                    for task in tasks:
+                        on_task(task)
         
-        else:
+        if not texts and not tasks_by_source:
             state["messages"].append("No content to process")
             state["status"] = "error"
+            return state
+        
+        if texts:
+            state["messages"].append(f"Analyzing {sum(len(text) for text in texts.values())} characters of content...")
+            tasks_by_source.update(self.doc_processor.extract_tasks_by_source(texts, on_task=on_task))
+        
+        state["source_digests"] = digests
+        state["tasks_by_source"] = {key: tasks_by_source.get(key, []) for key in order}
+        tasks = merge_tasks([state["tasks_by_source"][key] for key in order])
+        
+        extracted_tasks = self._reuse_unchanged(tasks, previous_by_source, state)
         
-        return state
\ No newline at end of file
+        state["extracted_tasks"] = extracted_tasks
+        state["messages"].append(f"Extracted {len(extracted_tasks)} task(s)")
+        
+        for i, task in enumerate(extracted_tasks, 1):
+            state["messages"].append(
+                f"   {i}. {task['task_name']} - Due: {task['deadline']} "
+                f"({task['estimated_hours']}h, {task['priority']})"
+            )
+        
+        return state
+    
+    def _reuse_unchanged(self, tasks: List[Dict], previous_by_source: Dict, state: SchedulerState) -> List[Task]:
+        """Turn extracted tasks into Task records, carrying over tasks that did not change.
+        
+        A task is unchanged when the previous run extracted exactly the same
+        name, course, deadline, hours and priority. It keeps its previous
+        (already RAG-adjusted) record and status, and its previous slots are
+        pinned so the scheduler leaves them where they are.
+        """
+        previous_raw = {_signature(task) for task in merge_tasks(list(previous_by_source.values()))}
+        previous_tasks = {(task['task_name'], task.get('course')): task for task in state.get("previous_tasks") or []}
+        
+        extracted_tasks = []
+        unchanged = set()
+        for task_dict in tasks:
+            key = (task_dict['task_name'], task_dict.get('course'))
+            if _signature(task_dict) in previous_raw and key in previous_tasks:
+                extracted_tasks.append(Task(**previous_tasks[key]))
+                unchanged.add(key)
+                continue
+            
+            # Already validated and normalized by the structured output parser
+            extracted_tasks.append(Task(
+                task_name=task_dict['task_name'],
+                deadline=task_dict['deadline'],
+                estimated_hours=task_dict['estimated_hours'],
+                priority=task_dict['priority'],
+                course=task_dict['course'],
+                scheduled_time=None,
+                status='pending'
+            ))
+        
+        state["pinned_slots"] = [
+            slot for slot in state.get("previous_schedule") or []
+            if (slot.get('task_name'), slot.get('course')) in unchanged
+        ]
+        if unchanged:
+            state["messages"].append(
+                f"{len(unchanged)} task(s) unchanged, keeping their {len(state['pinned_slots'])} slot(s)"
+            )
+        return extracted_tasks
+
+
+def _signature(task: Dict) -> tuple:
+    return (
+        task.get('task_name'), task.get('course'), task.get('deadline'),
+        float(task.get('estimated_hours') or 0), task.get('priority'),
+    )
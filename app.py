@@ -2,10 +2,18 @@ import streamlit as st
 import os
 import sys
 import config
-from agents.graph import SchedulerGraph
-from agents.state import create_initial_state
+from agents.graph import astream_progress, discard_run, thread_config
+from agents.registry import get_registry
+from agents.state import create_initial_state, create_update_state
+from utils.extraction_cache import get_extraction_cache
+from utils.llm import get_llm_metrics
+from utils.metrics import get_metrics
+from utils.time_slots import Schedule, format_day, parse_clock
 from datetime import datetime
+import asyncio
 import json
+import threading
+import uuid
 
 st.set_page_config(
     page_title="Smart Scheduler - AI-Powered Timetable",
@@ -74,6 +82,12 @@ st.markdown('<div class="main-header">Smart Scheduler</div>', unsafe_allow_html=
 with st.sidebar:
     st.header("Input Your Tasks")
     
+    tenant_id = st.text_input(
+        "Profile",
+        value="default",
+        help="Each profile has its own task history for estimate adjustment"
+    ).strip() or None
+    
     raw_input = st.text_area(
         "Describe your tasks:",
         placeholder="E.g., I have a Data Mining project due Jan 28, Theory assignment due Jan 30...",
@@ -100,11 +114,57 @@ with st.sidebar:
         file_paths = []
     
     st.markdown("---")
+    keep_previous = False
+    if st.session_state.final_state:
+        keep_previous = st.checkbox(
+            "Keep my current schedule",
+            value=True,
+            help="Only re-read changed inputs and only place new or edited tasks"
+        )
     generate_button = st.button("Generate Schedule", type="primary", use_container_width=True)
+    resume_button = False
+    if st.session_state.get("failed_thread_id"):
+        resume_button = st.button(
+            "Resume last run",
+            use_container_width=True,
+            help="Continue the failed run from its last completed step"
+        )
+    
+    with st.expander("System"):
+        if st.button("Warm up agents", use_container_width=True):
+            with st.spinner("Loading models..."):
+                build_seconds = get_registry().warm_up()
+            st.success(f"Agents ready (built in {build_seconds:.1f}s)")
+        if st.button("Reload agents", use_container_width=True):
+            get_registry().invalidate(all_entries=True)
+            st.info("Agents will be rebuilt on next run")
+        st.json(get_registry().health())
+        st.caption("Extracted-text cache")
+        st.json(get_extraction_cache().stats())
+        st.caption("LLM gateway")
+        st.json(get_llm_metrics())
     
+    with st.expander("Debug: timings"):
+        last_thread_id = st.session_state.get("last_thread_id")
+        if last_thread_id:
+            st.caption("Last run, slowest first")
+            st.dataframe(get_metrics().trace_summary(last_thread_id), use_container_width=True)
+        else:
+            st.caption("No run yet")
+        st.caption("All runs (Prometheus text format)")
+        st.code(get_metrics().prometheus_text(), language="text")
+    
+
+def cancel_run():
+    # Runs before the rerun the click triggers; the previous run's nodes are
+    # still working in the background and check this event
+    event = st.session_state.get("cancel_event")
+    if event is not None:
+        event.set()
 
-if generate_button:
-    if not raw_input and not uploaded_files:
+
+if generate_button or resume_button:
+    if generate_button and not raw_input and not uploaded_files:
         st.error("Please provide either text input or upload a file!")
     else:
         st.session_state.schedule_generated = False
@@ -112,36 +172,91 @@ if generate_button:
         with st.spinner("AI Agents are working..."):
             progress_bar = st.progress(0)
             status_text = st.empty()
+            partial_results = st.empty()
+            cancel_event = threading.Event()
+            st.session_state.cancel_event = cancel_event
+            st.button("Cancel", help="Stops the run; the schedule is not updated", on_click=cancel_run)
             
             status_text.text("Initializing multi-agent system...")
-            progress_bar.progress(10)
-            graph = SchedulerGraph()
-            compiled = graph.compile()
-            
-            status_text.text("Preparing input...")
-            progress_bar.progress(20)
-            # Store originals for chat updates
-            st.session_state.original_input = raw_input
-            st.session_state.original_files = file_paths
-
-            initial_state = create_initial_state(
-                raw_input=raw_input,
-                uploaded_file_paths=file_paths
-            )
+            progress_bar.progress(5)
+            compiled = get_registry().get_compiled()
             
             status_text.text("Extracting tasks...")
-            progress_bar.progress(40)
+            progress_bar.progress(10)
             
-            status_text.text("Enriching with RAG...")
-            progress_bar.progress(60)
+            if resume_button:
+                # Continue from the last checkpoint of the failed run
+                thread_id = st.session_state.failed_thread_id
+                initial_state = None
+            else:
+                # A new run replaces the failed one, which can no longer be resumed
+                discard_run(compiled, st.session_state.get("failed_thread_id"))
+                st.session_state.failed_thread_id = None
+                thread_id = str(uuid.uuid4())
+                # Store originals for chat updates
+                st.session_state.original_input = raw_input
+                st.session_state.original_files = file_paths
+
+                if keep_previous:
+                    initial_state = create_update_state(
+                        st.session_state.final_state,
+                        raw_input=raw_input,
+                        uploaded_file_paths=file_paths,
+                        tenant_id=tenant_id
+                    )
+                else:
+                    initial_state = create_initial_state(
+                        raw_input=raw_input,
+                        uploaded_file_paths=file_paths,
+                        tenant_id=tenant_id
+                    )
             
-            status_text.text("Creating schedule...")
-            progress_bar.progress(80)
+            st.session_state.last_thread_id = thread_id
             
-            final_state = compiled.invoke(initial_state)
+            async def run_graph():
+                # Pressing Cancel sets cancel_event, which stops the nodes, and
+                # reruns the script, which stops this loop
+                final = initial_state
+                found = []
+                async for event in astream_progress(
+                    compiled, initial_state, cancel_event=cancel_event, config=thread_config(thread_id)
+                ):
+                    if event["node"] == "cancelled":
+                        return None
+                    final = event["state"]
+                    if event["progress"] is not None:
+                        progress_bar.progress(event["progress"])
+                    status_text.text(event["label"])
+                    
+                    if "task" in event:
+                        task = event["task"]
+                        found.append(task)
+                        with partial_results.container():
+                            st.caption(f"Found {len(found)} task(s) so far...")
+                            for task in found:
+                                st.markdown(f"- **{task['task_name']}** (due {task['deadline']}, {task['estimated_hours']}h)")
+                    elif event["node"] == "extract_tasks":
+                        tasks = final.get("extracted_tasks", [])
+                        with partial_results.container():
+                            st.caption(f"Found {len(tasks)} task(s), scheduling...")
+                            for task in tasks:
+                                st.markdown(f"- **{task['task_name']}** (due {task['deadline']}, {task['estimated_hours']}h)")
+                partial_results.empty()
+                return final
             
-            status_text.text("Complete!")
-            progress_bar.progress(100)
+            try:
+                final_state = asyncio.run(run_graph())
+            except Exception as e:
+                # Completed steps are checkpointed; "Resume last run" picks up from there
+                st.session_state.failed_thread_id = thread_id if config.CHECKPOINT_ENABLED else None
+                st.error(f"Run failed: {e}")
+                st.stop()
+            st.session_state.failed_thread_id = None
+            # Only failed runs are resumed, so the checkpoints of the others can go
+            discard_run(compiled, thread_id)
+            if final_state is None:
+                st.warning("Run cancelled")
+                st.stop()
             
             st.session_state.final_state = final_state
             st.session_state.schedule_generated = True
@@ -161,32 +276,39 @@ if st.session_state.schedule_generated and st.session_state.final_state:
     schedule = st.session_state.get("schedule", [])
     
     if schedule:
-        from collections import defaultdict
-        schedule_by_date = defaultdict(list)
+        slots = Schedule.parse(schedule)
+        free_time = slots.free_time_per_day(parse_clock(config.WORK_DAY_START), parse_clock(config.WORK_DAY_END))
         
-        for slot in schedule:
-            schedule_by_date[slot['date']].append(slot)
-        
-        for date in sorted(schedule_by_date.keys()):
-            st.subheader(f"{date}")
+        for day in slots.days():
+            slot_date = format_day(day)
+            st.subheader(f"{slot_date}")
+            st.caption(f"{free_time[slot_date] / 60:.1f}h free")
             
-            for slot in schedule_by_date[date]:
-                priority_class = f"priority-{slot['priority'].lower()}"
+            for i in slots.on_day(day):
+                slot = slots.slot(i)
+                priority_class = f"priority-{slot.priority.label.lower()}"
                 
                 col1, col2, col3 = st.columns([2, 3, 1])
                 
                 with col1:
-                    st.markdown(f"**{slot['time_slot']}**")
+                    st.markdown(f"**{slot.time_slot}**")
                 
                 with col2:
-                    st.markdown(f"**{slot['task_name']}**")
-                    if slot.get('notes'):
-                        st.caption(slot['notes'])
+                    st.markdown(f"**{slot.task_name}**")
+                    if slot.notes:
+                        st.caption(slot.notes)
                 
                 with col3:
-                    st.markdown(f"<span class='{priority_class}'>{slot['priority']}</span>", 
+                    st.markdown(f"<span class='{priority_class}'>{slot.priority.label}</span>", 
                             unsafe_allow_html=True)
-                    st.caption(f"{slot['duration_hours']}h")
+                    st.caption(f"{slot.duration_hours}h")
+
+        # Slots with an unreadable date or time (e.g. from the LLM resolver) have no place in the timetable
+        if slots.invalid:
+            st.subheader("Could not place")
+            for _, slot, error in slots.invalid:
+                name = slot.get("task_name", "Unknown task") if isinstance(slot, dict) else str(slot)
+                st.markdown(f"- **{name}**: {error}")
 
         # Add this import at the top of app.py with other imports
         from streamlit_mermaid import st_mermaid
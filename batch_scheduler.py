@@ -0,0 +1,263 @@
+# batch_scheduler.py
+"""Headless batch scheduling over many inputs.
+
+Usage:
+    python batch_scheduler.py INPUT --output results.jsonl [--workers 4]
+        [--rate 30] [--parquet results.parquet] [--no-resume]
+
+INPUT is either a JSONL manifest with one object per line
+({"id": ..., "raw_input": ..., "files": [...], "tenant_id": ...}; the RAG
+memory of ``tenant_id`` is used, the default tenant's if it is missing) or
+a directory in which every sub-directory (all files inside) or top-level
+file is one input.
+Results are appended to the JSONL output as they finish; the ids that
+already succeeded there are skipped on the next run, so a crashed batch
+resumes where it stopped. With checkpointing enabled, an input whose run failed
+part-way continues from its last completed node instead of starting over.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+from agents.graph import discard_run, thread_config
+from agents.registry import get_registry
+from agents.state import create_initial_state
+from utils.document_processor import file_kind
+from utils.rate_limiter import TokenBucket
+
+
+def load_inputs(path: str) -> List[Dict]:
+    if os.path.isdir(path):
+        inputs = []
+        for name in sorted(os.listdir(path)):
+            full_path = os.path.join(path, name)
+            if os.path.isdir(full_path):
+                files = sorted(
+                    os.path.join(full_path, child) for child in os.listdir(full_path)
+                    if file_kind(child) != "unsupported"
+                )
+                inputs.append({"id": name, "raw_input": "", "files": files, "tenant_id": None})
+            elif file_kind(name) != "unsupported":
+                inputs.append({"id": name, "raw_input": "", "files": [full_path], "tenant_id": None})
+        return inputs
+
+    inputs = []
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            files = [
+                file_path if os.path.isabs(file_path) else os.path.join(base, file_path)
+                for file_path in item.get("files", [])
+            ]
+            inputs.append({
+                "id": str(item.get("id", line_number)),
+                "raw_input": item.get("raw_input", ""),
+                "files": files,
+                "tenant_id": item.get("tenant_id"),
+            })
+    return inputs
+
+
+def completed_ids(output_path: str) -> set:
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                # Failed inputs are retried (and resumed from their checkpoint)
+                if result["status"] != "error":
+                    done.add(result["id"])
+            except (ValueError, KeyError):
+                # A partially written last line from a crash; that input is redone
+                continue
+    return done
+
+
+def drop_partial_line(output_path: str):
+    """Truncate ``output_path`` after its last newline, so appended results start on a line of their own."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+def run_one(compiled, item: Dict) -> Dict:
+    started = time.perf_counter()
+    try:
+        state = None
+        run_config = None
+        if compiled.checkpointer is not None:
+            run_config = thread_config(f"batch:{item['id']}")
+            if compiled.get_state(run_config).next:
+                # A previous attempt failed part-way: continue after its last completed node
+                state = compiled.invoke(None, run_config)
+            else:
+                compiled.checkpointer.delete_thread(run_config["configurable"]["thread_id"])
+        if state is None:
+            state = compiled.invoke(create_initial_state(
+                raw_input=item["raw_input"],
+                uploaded_file_paths=item["files"] or None,
+                tenant_id=item.get("tenant_id")
+            ), run_config)
+        # The result is in the output file; checkpoints are only kept to resume failures
+        discard_run(compiled, run_config and run_config["configurable"]["thread_id"])
+        return {
+            "id": item["id"],
+            "status": state.get("status", "unknown"),
+            "extracted_tasks": state.get("extracted_tasks", []),
+            "schedule": state.get("schedule", []),
+            "conflicts": state.get("conflicts", []),
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": None,
+        }
+    except Exception as e:
+        return {
+            "id": item["id"],
+            "status": "error",
+            "extracted_tasks": [],
+            "schedule": [],
+            "conflicts": [],
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": str(e),
+        }
+
+
+def run_batch(
+    inputs: Iterable[Dict],
+    output_path: str,
+    workers: int = 4,
+    rate_per_minute: Optional[float] = None,
+    resume: bool = True,
+    report_every: int = 10,
+) -> Dict:
+    """Schedule every input with one shared warm graph and append results to ``output_path``."""
+    inputs = list(inputs)
+    done = completed_ids(output_path) if resume else set()
+    pending = [item for item in inputs if item["id"] not in done]
+
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    # The result a crash left half written is redone, so its fragment can go
+    drop_partial_line(output_path)
+
+    print(f"{len(inputs)} input(s), {len(inputs) - len(pending)} already done, {len(pending)} to run")
+
+    compiled = get_registry().get_compiled()
+    limiter = TokenBucket(rate_per_minute, capacity=1) if rate_per_minute else None
+    write_lock = threading.Lock()
+
+    def task(item):
+        if limiter:
+            limiter.acquire()
+        return run_one(compiled, item)
+
+    started = time.perf_counter()
+    finished = failed = 0
+    busy_seconds = 0.0
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(task, item) for item in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+            finished += 1
+            failed += result["status"] == "error"
+            busy_seconds += result["seconds"]
+
+            if finished % report_every == 0 or finished == len(pending):
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[{finished}/{len(pending)}] {finished / elapsed * 60:.1f} inputs/min, "
+                    f"avg {busy_seconds / finished:.2f}s per input, {failed} failed"
+                )
+
+    elapsed = time.perf_counter() - started
+    return {
+        "total": len(inputs),
+        "skipped": len(inputs) - len(pending),
+        "processed": finished,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 2),
+        "inputs_per_minute": round(finished / elapsed * 60, 2) if finished and elapsed else 0.0,
+        "avg_seconds_per_input": round(busy_seconds / finished, 3) if finished else 0.0,
+    }
+
+
+def export_parquet(jsonl_path: str, parquet_path: str):
+    # Optional dependency: only needed for Parquet export
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # A retried input has one line per attempt; only its last one is exported
+    rows = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            rows.pop(result["id"], None)
+            rows[result["id"]] = {
+                "id": result["id"],
+                "status": result["status"],
+                "seconds": result["seconds"],
+                "error": result["error"],
+                "task_count": len(result["extracted_tasks"]),
+                "slot_count": len(result["schedule"]),
+                "extracted_tasks": json.dumps(result["extracted_tasks"]),
+                "schedule": json.dumps(result["schedule"]),
+                "conflicts": json.dumps(result["conflicts"]),
+            }
+    rows = list(rows.values())
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+    print(f"Wrote {len(rows)} row(s) to {parquet_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule many syllabi without the UI")
+    parser.add_argument("input", help="JSONL manifest or directory of inputs")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=None, help="Max inputs started per minute")
+    parser.add_argument("--parquet", default=None, help="Also export results to this Parquet file")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore and overwrite existing output")
+    args = parser.parse_args()
+
+    summary = run_batch(
+        load_inputs(args.input),
+        args.output,
+        workers=args.workers,
+        rate_per_minute=args.rate,
+        resume=not args.no_resume,
+    )
+    print(json.dumps(summary, indent=2))
+
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
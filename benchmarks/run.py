@@ -0,0 +1,240 @@
+# benchmarks/run.py
+"""End-to-end benchmarks of SchedulerGraph against local stand-ins.
+
+Usage:
+    python -m benchmarks.run [WORKLOAD ...] [--repeat 3] [--llm-latency 0.05]
+        [--embedding-latency 0] [--vector-backend chroma]
+        [--baseline benchmarks/baseline.json]
+        [--save-baseline] [--fail-above 20] [--output results.json]
+
+Every run of a workload uses a fresh interpreter with the fake LLM (which
+also stands in for the vision model), the fake embeddings and a new vector
+store (Chroma unless ``--vector-backend numpy``), with all caches, rate limits, checkpoints and tracing off. The
+graph is run once end to end; per-stage seconds come from the metrics
+spans, peak memory is the worker's maximum RSS. With several repeats the
+median of each figure is reported.
+
+Results are compared with the baseline file when it exists; ``--fail-above``
+exits non-zero if total time or peak memory of any workload grew by more
+than that percentage. ``--save-baseline`` replaces the baseline instead.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from benchmarks.workloads import WORKLOADS, build
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_WORKLOADS = ["text-10", "text-100", "text-1000", "pdf-4x25", "mixed"]
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_worker(name: str, workdir: str, seed: int) -> Dict:
+    """Run one workload in this process; only called in the worker interpreter."""
+    from agents.graph import SchedulerGraph, thread_config
+    from agents.state import create_initial_state
+    from utils.llm import get_llm_metrics
+    from utils.metrics import get_metrics
+
+    raw_input, file_paths, expected = build(name, os.path.join(workdir, "input"), seed)
+
+    scheduler_graph = SchedulerGraph(persist_directory=os.path.join(workdir, "chroma_db"))
+    scheduler_graph.scheduler.rag.seed_initial_data()
+    compiled = scheduler_graph.compile()
+    get_metrics().reset()
+
+    started = time.perf_counter()
+    final_state = compiled.invoke(
+        create_initial_state(raw_input=raw_input, uploaded_file_paths=file_paths),
+        thread_config("benchmark")
+    )
+    seconds = time.perf_counter() - started
+
+    stages = {}
+    operations = {}
+    for row in get_metrics().trace_summary("benchmark"):
+        if row["kind"] == "node":
+            stages[row["name"]] = row["seconds"]
+        else:
+            operations[f"{row['kind']}/{row['name']}"] = {"calls": row["calls"], "seconds": row["seconds"]}
+
+    tasks = len(final_state.get("extracted_tasks", []))
+    llm = get_llm_metrics()
+    return {
+        "workload": name,
+        "status": final_state.get("status"),
+        "expected_tasks": expected,
+        "tasks": tasks,
+        "slots": len(final_state.get("schedule", [])),
+        "seconds": round(seconds, 3),
+        "tasks_per_second": round(tasks / seconds, 1) if seconds else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "llm_requests": llm["requests"],
+        "tokens_in": llm["tokens_in"],
+        "stages": stages,
+        "operations": operations,
+    }
+
+
+def _worker_env(args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "EMBEDDING_PROVIDER": "fake",
+        "VECTOR_BACKEND": args.vector_backend,
+        "FAKE_EMBEDDING_LATENCY": str(args.embedding_latency),
+        "LLM_REQUESTS_PER_MINUTE": "0",
+        "LLM_TOKENS_PER_MINUTE": "0",
+        "LLM_CACHE_ENABLED": "false",
+        "EXTRACTION_CACHE_ENABLED": "false",
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "CHECKPOINT_ENABLED": "false",
+        "METRICS_ENABLED": "true",
+        "METRICS_SPANS_PATH": "",
+        "METRICS_PROMETHEUS_PATH": "",
+        "LANGCHAIN_TRACING_V2": "false",
+    })
+    # Required by config.py, never used with the fake provider
+    env.setdefault("LANGSMITH_API_KEY", "benchmark")
+    env.setdefault("FAST_LLM", "fake")
+    return env
+
+
+def run_isolated(name: str, args, seed: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="scheduler-bench-") as workdir:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", name, "--workdir", workdir, "--seed", str(seed)],
+            capture_output=True, text=True, env=_worker_env(args),
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Workload {name} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _median(runs: List[Dict]) -> Dict:
+    """Median of every number across repeats, recursing into stages and operations."""
+    merged = {}
+    for key, value in runs[0].items():
+        if isinstance(value, bool) or not isinstance(value, (int, float, dict)):
+            merged[key] = value
+        elif isinstance(value, dict):
+            merged[key] = _median([run.get(key, {}) for run in runs if run.get(key)] or [value])
+        else:
+            merged[key] = round(statistics.median(run.get(key, value) for run in runs), 3)
+    return merged
+
+
+def _delta(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return ""
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
+
+
+def report(results: Dict[str, Dict], baseline: Optional[Dict], fail_above: Optional[float]) -> bool:
+    """Print a table per workload and return whether any regression exceeded ``fail_above``."""
+    regressed = False
+    baseline_workloads = (baseline or {}).get("workloads", {})
+
+    for name, result in results.items():
+        previous = baseline_workloads.get(name, {})
+        print(f"\n{name}: {result['tasks']}/{result['expected_tasks']} tasks, {result['slots']} slots, "
+              f"status {result['status']}")
+        rows = [("total seconds", result["seconds"], previous.get("seconds")),
+                ("tasks/second", result["tasks_per_second"], previous.get("tasks_per_second")),
+                ("peak RSS MB", result["peak_rss_mb"], previous.get("peak_rss_mb"))]
+        rows += [(f"  {stage}", seconds, previous.get("stages", {}).get(stage))
+                 for stage, seconds in result["stages"].items()]
+        rows += [(f"  {operation} x{values['calls']}", values["seconds"],
+                  previous.get("operations", {}).get(operation, {}).get("seconds"))
+                 for operation, values in result["operations"].items()]
+
+        for label, value, before in rows:
+            before_text = "" if before is None else f"{before:>10}"
+            print(f"  {label:<40}{value:>10}{before_text:>12}  {_delta(value, before)}")
+
+        if fail_above is not None:
+            for key in ("seconds", "peak_rss_mb"):
+                if previous.get(key) and (result[key] - previous[key]) / previous[key] * 100 > fail_above:
+                    print(f"  REGRESSION: {key} grew by more than {fail_above}%")
+                    regressed = True
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler graph offline")
+    parser.add_argument("workloads", nargs="*", help=f"any of {', '.join(WORKLOADS)} (default: all but text-10000)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per fake embedding call")
+    parser.add_argument("--vector-backend", default="chroma", choices=["chroma", "numpy"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--fail-above", type=float, help="percent; exit 1 on a larger regression")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.workdir, args.seed)))
+        return
+
+    names = args.workloads or DEFAULT_WORKLOADS
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workload(s): {', '.join(unknown)}")
+
+    settings = {
+        "llm_latency": args.llm_latency, "embedding_latency": args.embedding_latency,
+        "vector_backend": args.vector_backend, "seed": args.seed,
+    }
+    results = {}
+    for name in names:
+        print(f"Running {name} ({args.repeat}x)...", flush=True)
+        results[name] = _median([run_isolated(name, args, args.seed) for _ in range(args.repeat)])
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"Warning: baseline was recorded with {baseline.get('settings')}, not {settings}")
+
+    regressed = report(results, baseline, args.fail_above)
+
+    document = {"created": datetime.now().isoformat(timespec="seconds"), "settings": settings, "workloads": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        # Workloads not run this time keep their previous baseline
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                document["workloads"] = {**json.load(f).get("workloads", {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/workloads.py
+"""Synthetic scheduler inputs: task lists as text, multi-page PDFs and images."""
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+
+COURSES = [
+    "Data Mining", "Theory of Computation", "Database Systems", "Advanced Algorithms",
+    "Operating Systems", "Computer Networks", "Machine Learning", "Compiler Design",
+]
+KINDS = ["Assignment", "Problem Set", "Lab Report", "Project Milestone", "Reading", "Quiz Prep"]
+
+# name -> tasks in the text input, PDFs (with pages each) holding further tasks, and images
+WORKLOADS: Dict[str, Dict] = {
+    "text-10": {"tasks": 10},
+    "text-100": {"tasks": 100},
+    "text-1000": {"tasks": 1000},
+    "text-10000": {"tasks": 10000},
+    "pdf-4x25": {"pdfs": 4, "pages": 25, "tasks_per_page": 5},
+    "mixed": {"tasks": 200, "pdfs": 2, "pages": 10, "tasks_per_page": 5, "images": 4},
+}
+
+
+def task_lines(count: int, seed: int = 0, offset: int = 0, horizon_days: int = 14) -> List[str]:
+    """One line per task with an ISO deadline, which is what the fake LLM extracts tasks from."""
+    rng = random.Random(seed)
+    today = date.today()
+    lines = []
+    for i in range(offset, offset + count):
+        due = today + timedelta(days=rng.randint(1, horizon_days))
+        lines.append(f"{rng.choice(KINDS)} {i} for {rng.choice(COURSES)} due {due.isoformat()}")
+    return lines
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Write a minimal PDF with one text line per entry, readable by pypdf's extract_text."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree, filled in once the page object numbers are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers = []
+    for lines in pages:
+        content = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_string(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_numbers.append(len(objects))
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def build(name: str, directory: str, seed: int = 0) -> Tuple[str, List[str], int]:
+    """Create workload ``name`` in ``directory``; returns the raw input, file paths and task count."""
+    spec = WORKLOADS[name]
+    os.makedirs(directory, exist_ok=True)
+
+    raw_input = "\n".join(task_lines(spec.get("tasks", 0), seed))
+    expected = spec.get("tasks", 0)
+    file_paths = []
+
+    per_page = spec.get("tasks_per_page", 0)
+    for pdf in range(spec.get("pdfs", 0)):
+        pages = []
+        for page in range(spec["pages"]):
+            offset = expected + len(pages) * per_page
+            pages.append([f"Syllabus page {page + 1}"] + task_lines(per_page, seed + offset, offset))
+        expected += spec["pages"] * per_page
+        path = os.path.join(directory, f"syllabus_{pdf}.pdf")
+        write_pdf(path, pages)
+        file_paths.append(path)
+
+    rng = random.Random(seed)
+    for image in range(spec.get("images", 0)):
+        path = os.path.join(directory, f"whiteboard_{image}.png")
+        with open(path, "wb") as f:
+            # Only the bytes are sent (to the fake vision model), so they need not decode
+            f.write(b"\x89PNG\r\n\x1a\n" + bytes(rng.getrandbits(8) for _ in range(4096)))
+        file_paths.append(path)
+
+    return raw_input, file_paths, expected
@@ -0,0 +1,67 @@
+# check_import_time.py
+"""Fail if importing the agent graph gets slow or pulls in heavy backends.
+
+Run with ``python check_import_time.py [budget_seconds]``; exits non-zero
+when ``import agents.graph`` exceeds the budget (default 1.0s) or imports
+any of the modules that must only be loaded on first use.
+"""
+import json
+import subprocess
+import sys
+
+
+DEFAULT_BUDGET_SECONDS = 1.0
+
+LAZY_MODULES = [
+    "langgraph",
+    "langsmith",
+    "langchain_groq",
+    "langchain_community",
+    "langchain_huggingface",
+    "langchain_google_genai",
+    "sentence_transformers",
+    "torch",
+    "chromadb",
+    "numpy",
+    "pypdf",
+    "PIL",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import agents.graph
+elapsed = time.perf_counter() - started
+loaded = sorted({name.split('.')[0] for name in sys.modules} & set(%r))
+print(json.dumps({"seconds": elapsed, "loaded": loaded}))
+"""
+
+
+def measure() -> dict:
+    # A fresh interpreter so nothing is already cached in sys.modules
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % LAZY_MODULES],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_SECONDS
+    result = measure()
+
+    print(f"import agents.graph: {result['seconds']:.3f}s (budget {budget:.3f}s)")
+    failed = False
+
+    if result["seconds"] > budget:
+        print("Import time budget exceeded")
+        failed = True
+    if result["loaded"]:
+        print(f"Heavy modules imported eagerly: {', '.join(result['loaded'])}")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
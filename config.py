@@ -9,7 +9,78 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 GROQ_MODEL = os.getenv("FAST_LLM")
 
-if not GROQ_API_KEY:
+if not GROQ_API_KEY and os.getenv("LLM_PROVIDER", "groq") != "fake":
     raise ValueError("GROQ_API_KEY not found in .env file")
 if not LANGSMITH_API_KEY:
-    raise ValueError("LANGSMITH_API_KEY not found in .env file")
\ No newline at end of file
+    raise ValueError("LANGSMITH_API_KEY not found in .env file")
+
+# Scheduling engine
+WORK_DAY_START = os.getenv("WORK_DAY_START", "09:00")
+WORK_DAY_END = os.getenv("WORK_DAY_END", "21:00")
+MAX_SESSION_HOURS = float(os.getenv("MAX_SESSION_HOURS", "3"))
+BREAK_MINUTES = int(os.getenv("BREAK_MINUTES", "15"))
+MAX_SLOT_HOURS = float(os.getenv("MAX_SLOT_HOURS", "5"))  # longer slots are reported as duration issues
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "14"))
+SCHEDULER_LLM_ANNOTATE = os.getenv("SCHEDULER_LLM_ANNOTATE", "false").lower() == "true"
+
+# LLM response cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./data/llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "200"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "720"))
+
+# Document ingestion
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", "0"))  # 0 = one per CPU
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+EXTRACTION_CHUNK_TOKENS = int(os.getenv("EXTRACTION_CHUNK_TOKENS", "3000"))
+EXTRACTION_MAX_CONCURRENCY = int(os.getenv("EXTRACTION_MAX_CONCURRENCY", "4"))
+
+# Extracted-text cache for uploaded files
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "./data/extraction_cache")
+EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "100"))
+EXTRACTION_CACHE_MAX_AGE_DAYS = float(os.getenv("EXTRACTION_CACHE_MAX_AGE_DAYS", "90"))
+
+# Embedding cache for RAG memory
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000"))
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")  # huggingface or fake (offline, hashed words)
+FAKE_EMBEDDING_LATENCY = float(os.getenv("FAKE_EMBEDDING_LATENCY", "0"))
+
+# RAG memory (one collection per tenant)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # chroma (large stores) or numpy (in-process, fastest when small)
+RAG_TENANT_MAX_DOCUMENTS = int(os.getenv("RAG_TENANT_MAX_DOCUMENTS", "10000"))  # 0 = unlimited
+RAG_INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "256"))  # records per embedding call and write
+# Retention, applied by maintain_memory.py; 0 disables each
+RAG_TTL_DAYS = int(os.getenv("RAG_TTL_DAYS", "730"))
+RAG_MERGE_AFTER_DAYS = int(os.getenv("RAG_MERGE_AFTER_DAYS", "90"))  # older similar completions become one summary
+RAG_COURSE_MAX_COMPLETIONS = int(os.getenv("RAG_COURSE_MAX_COMPLETIONS", "500"))
+# Retrieval adds up to RAG_RECENCY_WEIGHT to the distance of old entries, half of it at the half-life
+RAG_RECENCY_WEIGHT = float(os.getenv("RAG_RECENCY_WEIGHT", "0.3"))
+RAG_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RAG_RECENCY_HALF_LIFE_DAYS", "180"))
+RAG_RECENCY_CANDIDATES = int(os.getenv("RAG_RECENCY_CANDIDATES", "3"))  # hits fetched per result to re-rank
+# Completed tasks of a course or task type needed before estimates are adjusted from
+# aggregates instead of the nearest past tasks
+TASK_STATS_MIN_COUNT = int(os.getenv("TASK_STATS_MIN_COUNT", "3"))
+
+# LLM gateway
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")  # groq or fake (offline, canned responses)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))  # 0 disables
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "60000"))  # 0 disables
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+
+# Graph checkpoints (resume failed runs, replay downstream nodes)
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "./data/checkpoints.sqlite3")
+
+# Timing and token metrics (spans as JSON lines, aggregates in Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SPANS_PATH = os.getenv("METRICS_SPANS_PATH", "./data/metrics/spans.jsonl")  # empty disables
+METRICS_SPANS_MAX_MB = int(os.getenv("METRICS_SPANS_MAX_MB", "50"))  # then rotated to <path>.1
+METRICS_PROMETHEUS_PATH = os.getenv("METRICS_PROMETHEUS_PATH", "./data/metrics/metrics.prom")  # empty disables
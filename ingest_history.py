@@ -0,0 +1,104 @@
+# ingest_history.py
+"""Bulk import of completed tasks and schedule patterns into RAG memory.
+
+Usage:
+    python ingest_history.py FILE [FILE ...] [--tenant ID]
+        [--kind auto|completion|pattern] [--batch-size 256]
+        [--persist-directory ./data/chroma_db]
+
+FILE is a CSV file with a header row or a JSONL file with one object per
+line, read as a stream. Completions have the fields of
+``RAGManager.add_task_completion`` (task_name, course, estimated_hours,
+actual_hours, priority, status, notes and optionally the ISO timestamp of
+completion), patterns those of ``add_schedule_pattern`` (time_slot,
+day_type, productivity, task_type, success_rate). With ``--kind auto``
+rows that have a task_name are completions and the rest patterns.
+Timestamps must be ISO 8601 (e.g. 2025-03-14 or 2025-03-14T16:00:00Z) and
+are stored in that form; rows whose timestamp does not parse are skipped
+and counted as invalid. Rows already in the tenant's memory are skipped,
+so a file can be imported again after adding to it. Rows with a timestamp
+match on content and time, rows without one on content and how many
+identical rows come before them in the file.
+"""
+import argparse
+import csv
+import json
+import os
+from typing import Dict, Iterator
+
+from utils.rag_manager import RAGManager
+
+
+NUMERIC_FIELDS = ("estimated_hours", "actual_hours", "success_rate")
+
+
+def _clean(record: Dict) -> Dict:
+    cleaned = {}
+    for key, value in record.items():
+        if key is None or value is None or value == "":
+            # Extra CSV cells and empty ones fall back to the defaults
+            continue
+        if key in NUMERIC_FIELDS and isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+        cleaned[key.strip()] = value
+    return cleaned
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                record = _clean(row)
+                if record:
+                    yield record
+            return
+
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"{path}:{line_number}: not valid JSON, skipped")
+                continue
+            if isinstance(record, dict):
+                yield _clean(record)
+            else:
+                print(f"{path}:{line_number}: not a JSON object, skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import task history into RAG memory")
+    parser.add_argument("files", nargs="+", help="CSV or JSONL files")
+    parser.add_argument("--tenant", help="tenant whose memory to add to (default tenant if omitted)")
+    parser.add_argument("--kind", default="auto", choices=["auto", "completion", "pattern"])
+    parser.add_argument("--batch-size", type=int, help="records per batch (default: RAG_INGEST_BATCH_SIZE)")
+    parser.add_argument("--persist-directory", default="./data/chroma_db")
+    args = parser.parse_args()
+
+    missing = [path for path in args.files if not os.path.exists(path)]
+    if missing:
+        parser.error(f"not found: {', '.join(missing)}")
+
+    rag = RAGManager(persist_directory=args.persist_directory)
+    kind = None if args.kind == "auto" else args.kind
+
+    def progress(totals: Dict):
+        print(f"  {totals['read']} read, {totals['added']} added, {totals['duplicates']} duplicate(s), "
+              f"{totals['invalid']} invalid, "
+              f"{totals['records_per_second']} records/s")
+
+    for path in args.files:
+        print(f"Importing {path}...")
+        totals = rag.ingest(read_records(path), args.tenant, kind=kind, batch_size=args.batch_size,
+                            on_progress=progress)
+        print(json.dumps(totals, indent=2))
+
+    print(f"Tenant memory now holds {rag.count(args.tenant)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# maintain_memory.py
+"""Offline maintenance of RAG memory: retention policies and index rebuild.
+
+Usage:
+    python maintain_memory.py [--tenant ID ...] [--ttl-days N]
+        [--merge-after-days N] [--max-per-course N] [--no-rebuild]
+        [--persist-directory ./data/chroma_db]
+
+Without ``--tenant`` every tenant with completed tasks on record is
+maintained. Each one is passed through ``RAGManager.maintain``: entries
+older than the TTL are deleted, older completions of the same course and
+name are merged into summaries, each course keeps its newest completions
+up to the cap, the tenant quota is applied and the collection is rewritten.
+The options override RAG_TTL_DAYS, RAG_MERGE_AFTER_DAYS and
+RAG_COURSE_MAX_COMPLETIONS for this run; 0 disables a policy. A running
+app picks up the rewritten collections on its next access. With Chroma its
+requests can fail while a collection is being swapped, so run this at a
+quiet time, e.g. from a nightly cron job.
+"""
+import argparse
+import json
+
+import config
+from utils.rag_manager import RAGManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply retention policies to RAG memory and rebuild it")
+    parser.add_argument("--tenant", action="append", help="tenant to maintain (repeatable; default: all)")
+    parser.add_argument("--ttl-days", type=int, help="override RAG_TTL_DAYS")
+    parser.add_argument("--merge-after-days", type=int, help="override RAG_MERGE_AFTER_DAYS")
+    parser.add_argument("--max-per-course", type=int, help="override RAG_COURSE_MAX_COMPLETIONS")
+    parser.add_argument("--no-rebuild", action="store_true", help="skip rewriting the collections")
+    parser.add_argument("--persist-directory", default="./data/chroma_db")
+    args = parser.parse_args()
+
+    if args.ttl_days is not None:
+        config.RAG_TTL_DAYS = args.ttl_days
+    if args.merge_after_days is not None:
+        config.RAG_MERGE_AFTER_DAYS = args.merge_after_days
+    if args.max_per_course is not None:
+        config.RAG_COURSE_MAX_COMPLETIONS = args.max_per_course
+
+    rag = RAGManager(persist_directory=args.persist_directory)
+    for tenant in args.tenant or rag.tenants():
+        print(json.dumps(rag.maintain(tenant, rebuild=not args.no_rebuild)))
+
+
+if __name__ == "__main__":
+    main()
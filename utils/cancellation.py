@@ -0,0 +1,34 @@
+# utils/cancellation.py
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class Cancelled(Exception):
+    """Raised inside a graph run once its cancel event has been set."""
+
+
+# The cancel event of the graph run on this thread; pool threads see it
+# through ``utils.metrics.bind``, which copies the context
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("cancel_event", default=None)
+
+
+@contextmanager
+def cancel_scope(event: Optional[threading.Event]):
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancelled() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def check_cancelled():
+    """Raise ``Cancelled`` if the current run has been cancelled; call between units of work."""
+    if cancelled():
+        raise Cancelled()
@@ -0,0 +1,69 @@
+# utils/checkpoints.py
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import config
+
+
+_lock = threading.Lock()
+_checkpointer = None
+
+
+def _saver_class():
+    # Imported on first use; langgraph is kept out of module import time
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """SqliteSaver that also serves async graph runs.
+
+        The app runs the graph with ``astream`` under a fresh event loop per
+        Streamlit rerun, which rules out the loop-bound AsyncSqliteSaver; the
+        sync methods are thread-safe, so the async ones run them in a thread.
+        """
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    return ThreadedSqliteSaver
+
+
+def get_checkpointer(path: Optional[str] = None):
+    """Process-wide SQLite checkpointer, or None when checkpointing is disabled."""
+    global _checkpointer
+
+    if path is None and not config.CHECKPOINT_ENABLED:
+        return None
+
+    with _lock:
+        if path is not None:
+            return _open(path)
+        if _checkpointer is None:
+            _checkpointer = _open(config.CHECKPOINT_PATH)
+        return _checkpointer
+
+
+def _open(path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # One connection shared by every thread; SqliteSaver serialises access with its own lock
+    return _saver_class()(sqlite3.connect(path, check_same_thread=False))
@@ -0,0 +1,101 @@
+# utils/chunking.py
+import re
+from typing import Dict, List
+
+from utils.scheduling_engine import PRIORITY_RANK
+
+
+SECTION_MARKER = re.compile(r"^(?=--- (?:Page \d+|Content from .+?) ---$)", re.MULTILINE)
+FILE_MARKER = re.compile(r"--- Content from .+? ---")
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(section: str, max_chars: int) -> List[str]:
+    """Split a section that is too big on its own along line boundaries."""
+    pieces, current = [], ""
+    for line in section.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split extracted document text into chunks of at most ``max_tokens``.
+
+    Chunks break on the ``--- Page N ---`` / ``--- Content from ... ---``
+    markers written during ingestion. A chunk that starts in the middle of a
+    file is prefixed with that file's marker so the course context survives.
+    """
+    max_chars = max(200, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks, current, current_file = [], "", ""
+    for section in SECTION_MARKER.split(text):
+        if not section.strip():
+            continue
+
+        file_match = FILE_MARKER.search(section)
+        if file_match:
+            current_file = file_match.group()
+
+        header = f"{current_file}\n" if current_file else ""
+        budget = max_chars - len(header)
+
+        for piece in _split_oversized(section, budget) if len(section) > budget else [section]:
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            if not current and header and not piece.lstrip().startswith("--- Content from"):
+                current = header
+            current += piece
+
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def merge_tasks(task_lists: List[List[Dict]]) -> List[Dict]:
+    """Merge per-chunk extraction results, dropping duplicates.
+
+    Tasks with the same name, course and deadline are treated as one; the
+    merged task keeps the highest priority and the largest estimate seen.
+    """
+    merged: Dict[tuple, Dict] = {}
+    for tasks in task_lists:
+        for task in tasks:
+            if not isinstance(task, dict):
+                continue
+            key = (_normalize(task.get("task_name")), _normalize(task.get("course")), _normalize(task.get("deadline")))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(task)
+                continue
+
+            if PRIORITY_RANK.get(task.get("priority"), 1) < PRIORITY_RANK.get(existing.get("priority"), 1):
+                existing["priority"] = task["priority"]
+            try:
+                existing["estimated_hours"] = max(
+                    float(existing.get("estimated_hours") or 0), float(task.get("estimated_hours") or 0)
+                )
+            except (TypeError, ValueError):
+                pass
+    return list(merged.values())
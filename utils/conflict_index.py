@@ -0,0 +1,152 @@
+# utils/conflict_index.py
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple, Union
+
+from utils.time_slots import Schedule, format_day, format_time_slot
+
+
+OVERLAP = "overlap"
+DOUBLE_BOOKING = "double_booking"
+BREAK_VIOLATION = "break_violation"
+INVALID_SLOT = "invalid_slot"
+
+
+class SlotInterval:
+    __slots__ = ("index", "date", "start", "end", "task_name")
+
+    def __init__(self, index: int, date: str, start: int, end: int, task_name: str):
+        self.index = index
+        self.date = date
+        self.start = start
+        self.end = end
+        self.task_name = task_name
+
+    def label(self) -> str:
+        return f"{self.task_name} ({format_time_slot(self.start, self.end)})"
+
+
+class Conflict:
+    __slots__ = ("kind", "date", "slot_indices", "message")
+
+    def __init__(self, kind: str, date: Optional[str], slot_indices: Tuple[int, ...], message: str):
+        self.kind = kind
+        self.date = date
+        self.slot_indices = slot_indices
+        self.message = message
+
+    def __repr__(self):
+        return f"Conflict({self.kind!r}, {self.message!r})"
+
+
+class ConflictIndex:
+    """Per-day index of schedule slots as integer minute intervals.
+
+    Built on a ``Schedule``, so every slot is parsed only once. Overlaps are
+    found with a sweep line over the slots of each day, reporting every
+    overlapping pair (not just neighbours) in O(n log n + k). ``overlapping``
+    answers range queries against the index; ``intervals`` gives a day's
+    slots in start order, from which the repair solver seeds its free-time
+    search.
+    """
+
+    def __init__(self, schedule: Union[List[Dict], Schedule], break_minutes: int = 0):
+        self.slots = schedule if isinstance(schedule, Schedule) else Schedule.parse(schedule)
+        self.break_minutes = break_minutes
+        self.invalid: List[Conflict] = [
+            Conflict(
+                INVALID_SLOT, slot.get("date") if isinstance(slot, dict) else None, (index,),
+                f"Invalid slot for {self._name(slot)}: {error}"
+            )
+            for index, slot, error in self.slots.invalid
+        ]
+
+        # The Schedule has already parsed every slot and sorts each day by start time
+        slots = self.slots
+        self._days: Dict[str, List[SlotInterval]] = {}
+        for day in slots.days():
+            date = format_day(day)
+            self._days[date] = [
+                SlotInterval(slots.source[i], date, slots.start[i], slots.end[i], slots.task_names[slots.task[i]])
+                for i in slots.on_day(day)
+            ]
+
+        self._starts: Dict[str, List[int]] = {}
+        self._max_length: Dict[str, int] = {}
+        for date, intervals in self._days.items():
+            self._starts[date] = [interval.start for interval in intervals]
+            self._max_length[date] = max(interval.end - interval.start for interval in intervals)
+
+    @staticmethod
+    def _name(slot) -> str:
+        if isinstance(slot, dict):
+            return slot.get("task_name", "Unnamed Task")
+        return "Unnamed Task"
+
+    def dates(self) -> List[str]:
+        return sorted(self._days)
+
+    def intervals(self, date: str) -> List[SlotInterval]:
+        return self._days.get(date, [])
+
+    def overlapping(self, date: str, start: int, end: int, exclude: Optional[int] = None) -> List[SlotInterval]:
+        """Return slots on ``date`` that intersect ``[start, end)``."""
+        intervals = self._days.get(date)
+        if not intervals:
+            return []
+        starts = self._starts[date]
+        # Only slots starting within one max-length before ``start`` can reach it
+        low = bisect_left(starts, start - self._max_length[date] + 1)
+        high = bisect_left(starts, end)
+        return [
+            interval for interval in intervals[low:high]
+            if interval.end > start and interval.index != exclude
+        ]
+
+    def overlap_pairs(self, date: str) -> List[Tuple[SlotInterval, SlotInterval]]:
+        pairs = []
+        active = []  # min-heap of (end, position)
+        intervals = self._days.get(date, [])
+        for position, interval in enumerate(intervals):
+            while active and active[0][0] <= interval.start:
+                heapq.heappop(active)
+            for _, other in active:
+                pairs.append((intervals[other], interval))
+            heapq.heappush(active, (interval.end, position))
+        return pairs
+
+    def break_violations(self, date: str) -> List[Tuple[SlotInterval, SlotInterval]]:
+        violations = []
+        if self.break_minutes <= 0:
+            return violations
+        latest = None
+        for interval in self._days.get(date, []):
+            if latest is not None and latest.end <= interval.start < latest.end + self.break_minutes:
+                violations.append((latest, interval))
+            if latest is None or interval.end > latest.end:
+                latest = interval
+        return violations
+
+    def conflicts(self) -> List[Conflict]:
+        conflicts = list(self.invalid)
+
+        for date in self.dates():
+            for first, second in self.overlap_pairs(date):
+                if (first.start, first.end) == (second.start, second.end):
+                    kind, title = DOUBLE_BOOKING, "Double booking"
+                else:
+                    kind, title = OVERLAP, "Overlap"
+                conflicts.append(Conflict(
+                    kind, date, (first.index, second.index),
+                    f"{title} on {date}: {first.label()} and {second.label()}"
+                ))
+
+            for first, second in self.break_violations(date):
+                gap = second.start - first.end
+                conflicts.append(Conflict(
+                    BREAK_VIOLATION, date, (first.index, second.index),
+                    f"Break violation on {date}: only {gap} min between "
+                    f"{first.label()} and {second.label()} (need {self.break_minutes} min)"
+                ))
+
+        return conflicts
@@ -0,0 +1,194 @@
+# utils/conflict_repair.py
+from bisect import insort
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import config
+from utils.conflict_index import ConflictIndex, INVALID_SLOT
+from utils.scheduling_engine import PRIORITY_RANK, placed_late
+from utils.time_slots import DATE_FORMAT, format_time_slot, parse_clock, parse_date, parse_time_slot
+
+
+class RepairResult:
+
+    def __init__(self, schedule: List[Dict], moved: int, split: int, unplaced: List[int]):
+        self.schedule = schedule
+        self.moved = moved
+        self.split = split
+        # Indices (into ``schedule``) of slots that could not be moved to a free place
+        self.unplaced = unplaced
+
+
+class RepairSolver:
+    """Incremental conflict repair that only touches conflicting slots.
+
+    Long sessions are split, then for every conflicting pair the
+    lower-priority slot is moved: first within its own day, then to the
+    nearest day before the task's deadline. Every other slot is left exactly
+    where it was, and so is a slot that cannot be placed anywhere: its time
+    is reserved before the rest are placed, so a move never lands on it.
+    Sessions the engine itself put past their deadline (for lack of earlier
+    capacity) are not moved, as there is nowhere earlier to put them.
+    """
+
+    def __init__(
+        self,
+        work_day_start: Optional[str] = None,
+        work_day_end: Optional[str] = None,
+        max_session_hours: Optional[float] = None,
+        break_minutes: Optional[int] = None,
+        search_days: int = 60,
+    ):
+        self.work_start = parse_clock(work_day_start or config.WORK_DAY_START)
+        self.work_end = parse_clock(work_day_end or config.WORK_DAY_END)
+        hours = max_session_hours if max_session_hours is not None else config.MAX_SESSION_HOURS
+        self.max_session = min(int(hours * 60), self.work_end - self.work_start)
+        self.break_minutes = break_minutes if break_minutes is not None else config.BREAK_MINUTES
+        self.search_days = search_days
+
+    def repair(self, schedule: List[Dict], tasks: List[Dict], today: Optional[date] = None) -> RepairResult:
+        today = today or date.today()
+        deadlines = {task['task_name']: parse_date(task.get('deadline')) for task in tasks}
+
+        slots, split = self._split_long_sessions(schedule)
+        index = ConflictIndex(slots, break_minutes=self.break_minutes)
+        to_move = self._select_slots_to_move(slots, index, deadlines)
+        order = sorted(to_move, key=lambda i: PRIORITY_RANK.get(slots[i].get('priority'), 1))
+
+        # A slot that cannot be placed stays where it is; its time is then
+        # reserved and the others placed again, until every one that is left
+        # fits. Each round fixes at least one more slot, so this terminates.
+        fixed: Set[int] = set()
+        while True:
+            occupied: Dict[str, List[Tuple[int, int]]] = {}
+            for day in index.dates():
+                for interval in index.intervals(day):
+                    if interval.index not in to_move or interval.index in fixed:
+                        insort(occupied.setdefault(day, []), (interval.start, interval.end))
+
+            placements, failed = {}, []
+            for slot_index in order:
+                if slot_index in fixed:
+                    continue
+                slot = slots[slot_index]
+                placement = self._place(slot, occupied, deadlines.get(slot.get('task_name')), today)
+                if placement is None:
+                    failed.append(slot_index)
+                    continue
+                day, start, end = placement
+                insort(occupied.setdefault(day, []), (start, end))
+                placements[slot_index] = placement
+            if not failed:
+                break
+            fixed.update(failed)
+
+        moved = 0
+        for slot_index, (day, start, end) in placements.items():
+            slot = slots[slot_index]
+            if (day, format_time_slot(start, end)) != (slot.get('date'), slot.get('time_slot')):
+                slots[slot_index] = dict(
+                    slot, date=day, time_slot=format_time_slot(start, end),
+                    notes=f"Moved to resolve conflict. {slot.get('notes', '')}".strip()
+                )
+                moved += 1
+
+        return RepairResult(slots, moved, split, sorted(fixed))
+
+    def _split_long_sessions(self, schedule: List[Dict]) -> Tuple[List[Dict], int]:
+        slots, split = [], 0
+        for slot in schedule:
+            try:
+                start, end = parse_time_slot(slot['time_slot'])
+            except (KeyError, TypeError, ValueError):
+                slots.append(slot)
+                continue
+
+            hours = max(float(slot.get('duration_hours') or 0), (end - start) / 60)
+            if hours <= config.MAX_SLOT_HOURS or end - start <= self.max_session:
+                slots.append(slot)
+                continue
+
+            # The first piece keeps the original start; the rest overlap it on
+            # purpose so that they are picked up and placed by the mover.
+            pieces = -(-(end - start) // self.max_session)
+            length = -(-(end - start) // pieces)
+            remaining = end - start
+            for number in range(1, pieces + 1):
+                piece = min(length, remaining)
+                remaining -= piece
+                slots.append(dict(
+                    slot, time_slot=format_time_slot(start, start + piece),
+                    duration_hours=round(piece / 60, 2),
+                    notes=f"Part {number}/{pieces} of a split session. {slot.get('notes', '')}".strip()
+                ))
+            split += 1
+        return slots, split
+
+    def _select_slots_to_move(self, slots: List[Dict], index: ConflictIndex, deadlines: Dict) -> Set[int]:
+        to_move = set()
+
+        for conflict in index.conflicts():
+            if conflict.kind == INVALID_SLOT:
+                continue
+            first, second = conflict.slot_indices
+            if first in to_move or second in to_move:
+                continue
+            # Keep the higher-priority slot; on ties move the later one
+            rank_first = PRIORITY_RANK.get(slots[first].get('priority'), 1)
+            rank_second = PRIORITY_RANK.get(slots[second].get('priority'), 1)
+            to_move.add(first if rank_first > rank_second else second)
+
+        for i, slot in enumerate(slots):
+            if placed_late(slot):
+                continue
+            deadline = deadlines.get(slot.get('task_name'))
+            slot_day = parse_date(slot.get('date'))
+            if deadline and slot_day and slot_day > deadline:
+                to_move.add(i)
+
+        return to_move
+
+    def _candidate_days(self, original: Optional[date], deadline: Optional[date], today: date) -> List[date]:
+        latest = deadline or (today + timedelta(days=self.search_days))
+        if original is not None and original < today:
+            original = today
+        if original is None or original > latest:
+            # Deadline violations move to the nearest earlier day, latest first
+            return [latest - timedelta(days=i) for i in range((latest - today).days + 1)][:self.search_days]
+
+        days = [original]
+        for offset in range(1, self.search_days + 1):
+            for day in (original - timedelta(days=offset), original + timedelta(days=offset)):
+                if today <= day <= latest:
+                    days.append(day)
+        return days
+
+    def _place(self, slot: Dict, occupied: Dict, deadline: Optional[date], today: date) -> Optional[Tuple[str, int, int]]:
+        try:
+            start, end = parse_time_slot(slot['time_slot'])
+            length = end - start
+        except (KeyError, TypeError, ValueError):
+            start = self.work_start
+            length = int(float(slot.get('duration_hours') or 1) * 60)
+
+        original = parse_date(slot.get('date'))
+        for day in self._candidate_days(original, deadline, today):
+            key = day.strftime(DATE_FORMAT)
+            found = self._find_gap(occupied.get(key, []), start, length)
+            if found is not None:
+                return key, found, found + length
+        return None
+
+    def _find_gap(self, intervals: List[Tuple[int, int]], preferred: int, length: int) -> Optional[int]:
+        """Return the start closest to ``preferred`` of a free gap that fits ``length``."""
+        best = None
+        cursor = self.work_start
+        for busy_start, busy_end in intervals + [(self.work_end + self.break_minutes, self.work_end)]:
+            gap_start = cursor
+            gap_end = min(busy_start - self.break_minutes, self.work_end)
+            if gap_end - gap_start >= length:
+                candidate = min(max(preferred, gap_start), gap_end - length)
+                if best is None or abs(candidate - preferred) < abs(best - preferred):
+                    best = candidate
+            cursor = max(cursor, busy_end + self.break_minutes)
+        return best
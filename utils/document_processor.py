@@ -1,31 +1,72 @@
 import os
 import sys
-from typing import List, Dict
+import time
+from typing import Callable, Dict, Iterator, List, Optional
 import config
 from utils.llm import get_llm
-from pypdf import PdfReader
-from PIL import Image
+from utils.cancellation import Cancelled, cancelled, check_cancelled
+from utils.chunking import merge_tasks, split_into_chunks
+from utils.extraction_cache import get_extraction_cache
+from utils.metrics import bind, get_metrics
+from utils.structured_output import stream_json_array, validate_task
 import base64
-from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+TEXT_EXTENSIONS = ('.txt',)
+
+VISION_MODEL = "llama-3.2-90b-vision-preview"
+# Bump these whenever extraction output changes so stale cache entries are ignored
+PDF_EXTRACTOR_VERSION = "pypdf-pages-1"
+IMAGE_EXTRACTOR_VERSION = f"vision-{VISION_MODEL}-1"
+
+
+def file_kind(file_path: str) -> str:
+    lower = file_path.lower()
+    if lower.endswith(PDF_EXTENSIONS):
+        return "pdf"
+    if lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if lower.endswith(TEXT_EXTENSIONS):
+        return "text"
+    return "unsupported"
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Module-level so it can run in a worker process."""
+    from pypdf import PdfReader
+    
+    reader = PdfReader(pdf_path)
+    pages = []
+    
+    for page_num, page in enumerate(reader.pages):
+        page_text = page.extract_text()
+        pages.append(f"\n--- Page {page_num + 1} ---\n{page_text}\n")
+    
+    return "".join(pages).strip()
+
+
 class DocumentProcessor:
     
-    def __init__(self):
-        self.llm = get_llm(temperature=0)
+    def __init__(self, model=None):
+        self.llm = get_llm(temperature=0, model=model)
+        self.cache = get_extraction_cache()
     
     def process_pdf(self, pdf_path: str) -> str:
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            
-            for page_num, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
+            text = self.cache.get(pdf_path, PDF_EXTRACTOR_VERSION)
+            if text is not None:
+                print(f"Loaded {len(text)} characters from extraction cache")
+                return text
             
+            text = extract_pdf_text(pdf_path)
+            self.cache.put(pdf_path, PDF_EXTRACTOR_VERSION, text)
             print(f"Extracted {len(text)} characters from PDF")
-            return text.strip()
+            return text
             
         except Exception as e:
             print(f"Error processing PDF: {e}")
@@ -33,14 +74,16 @@ class DocumentProcessor:
     
     def process_image_with_llm(self, image_path: str) -> str:
         try:
+            cached = self.cache.get(image_path, IMAGE_EXTRACTOR_VERSION)
+            if cached is not None:
+                print("Loaded image text from extraction cache")
+                return cached
+            
             with open(image_path, "rb") as image_file:
                 image_data = base64.b64encode(image_file.read()).decode('utf-8')
             
-            from langchain_groq import ChatGroq
-            vision_llm = ChatGroq(
-                model="llama-3.2-90b-vision-preview",
-                temperature=0
-            )
+            # Extracted text is cached per file, so the response cache is skipped
+            vision_llm = get_llm(temperature=0, model=VISION_MODEL, use_cache=False)
             
             from langchain_core.messages import HumanMessage
             
@@ -61,6 +104,7 @@ class DocumentProcessor:
             
             response = vision_llm.invoke([message])
             extracted_text = response.content
+            self.cache.put(image_path, IMAGE_EXTRACTOR_VERSION, extracted_text)
             
             print(f"Extracted text from image using vision model")
             return extracted_text
@@ -73,7 +117,50 @@ class DocumentProcessor:
     def _fallback_image_processing(self, image_path: str) -> str:
         return f"[Image uploaded: {os.path.basename(image_path)}]\nPlease manually describe the content."
     
-    def extract_tasks_from_text(self, text: str) -> List[Dict]:
+    def extract_tasks_from_text(self, text: str, on_task: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Extract tasks chunk by chunk (concurrently) and merge the results.
+        
+        ``on_task`` is called with every task as soon as it has been streamed
+        and validated, before the merge; with several chunks it is called from
+        worker threads and may see duplicates.
+        """
+        return self.extract_tasks_by_source({"text": text}, on_task)["text"]
+    
+    def extract_tasks_by_source(
+        self, texts: Dict[str, str], on_task: Optional[Callable[[Dict], None]] = None
+    ) -> Dict[str, List[Dict]]:
+        """Like extract_tasks_from_text for several inputs at once, keeping the tasks of each input apart.
+        
+        The chunks of all inputs share one pool, so a few large inputs and
+        many small ones are extracted with the same concurrency.
+        """
+        jobs = [
+            (key, chunk)
+            for key, text in texts.items()
+            for chunk in split_into_chunks(text, config.EXTRACTION_CHUNK_TOKENS)
+        ]
+        results: Dict[str, List[List[Dict]]] = {key: [] for key in texts}
+        
+        if len(jobs) == 1:
+            key, chunk = jobs[0]
+            results[key].append(self._extract_tasks_from_chunk(chunk, on_task))
+        elif jobs:
+            print(f"Extracting tasks from {len(jobs)} chunks...")
+            with ThreadPoolExecutor(max_workers=max(1, config.EXTRACTION_MAX_CONCURRENCY)) as pool:
+                extracted = pool.map(bind(lambda job: self._extract_tasks_from_chunk(job[1], on_task)), jobs)
+                for (key, _), tasks in zip(jobs, extracted):
+                    results[key].append(tasks)
+        
+        merged = {}
+        for key, chunk_results in results.items():
+            if len(chunk_results) > 1:
+                merged[key] = merge_tasks(chunk_results)
+                print(f"Merged {sum(len(r) for r in chunk_results)} task(s) into {len(merged[key])} unique task(s)")
+            else:
+                merged[key] = chunk_results[0] if chunk_results else []
+        return merged
+    
+    def _extract_tasks_from_chunk(self, text: str, on_task: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
         prompt = f"""You are a task extraction expert. Extract all tasks, assignments, and deadlines from the following text.
 
     For each task, identify:
@@ -100,28 +187,14 @@ class DocumentProcessor:
     If no tasks found, return: []
     """
         
+        # Chunks still queued when the run is cancelled are not sent
+        check_cancelled()
         try:
-            response = self.llm.invoke(prompt)
-            content = response.content
-            
-            print(f"\n{'='*50}")
-            print("LLM RAW RESPONSE:")
-            print(content)
-            print(f"{'='*50}\n")
-            
-            import json
-            import re
-            
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            
-            if json_match:
-                tasks = json.loads(json_match.group())
-                print(f"Extracted {len(tasks)} task(s)")
-                return tasks
-            else:
-                print("No JSON array found in LLM response")
-                print(f"Response content: {content[:500]}")  # Print first 500 chars
-                return []
+            with get_metrics().span("extract_chunk", "extraction", payload_bytes=len(text)) as span:
+                tasks = stream_json_array(self.llm, prompt, validate_task, on_item=on_task)
+                span.set(items=len(tasks))
+            print(f"Extracted {len(tasks)} task(s)")
+            return tasks
                 
         except Exception as e:
             print(f"Error extracting tasks: {e}")
@@ -130,6 +203,93 @@ class DocumentProcessor:
             return []
 
 
+    def _read_text_file(self, file_path: str) -> str:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def iter_process_files(self, file_paths: List[str]) -> Iterator[Dict]:
+        """Extract text from all files concurrently, yielding each result as it completes.
+        
+        PDFs are parsed in a process pool (pypdf is CPU bound), images are sent
+        to the vision model from a bounded thread pool. Each result is a dict with
+        ``index`` (position in ``file_paths``), ``path``, ``name``, ``kind``,
+        ``text``, ``error`` and ``cached``. Cached PDFs are returned without
+        touching the pool, which is started on the first PDF to parse and
+        shut down when the batch ends. Each file is recorded as a metrics span from
+        submission to completion. Once the run is cancelled (see
+        ``utils.cancellation``) files not started yet are dropped and
+        ``Cancelled`` is raised.
+        """
+        pdf_paths = [path for path in file_paths if file_kind(path) == "pdf" and os.path.exists(path)]
+        # A process pool only pays off when there is more than one PDF to parse
+        use_pool = len(pdf_paths) > 1
+        
+        with ExitStack() as stack:
+            threads = stack.enter_context(ThreadPoolExecutor(max_workers=max(1, config.OCR_MAX_CONCURRENCY)))
+            processes = None
+            futures = {}
+            
+            for index, path in enumerate(file_paths):
+                result = {
+                    "index": index, "path": path, "name": os.path.basename(path),
+                    "kind": file_kind(path), "text": "", "error": None, "cached": False,
+                }
+                
+                if not os.path.exists(path):
+                    result["error"] = "File not found"
+                    yield result
+                    continue
+                
+                submitted = time.time()
+                if result["kind"] == "pdf":
+                    cached = self.cache.get(path, PDF_EXTRACTOR_VERSION)
+                    if cached is not None:
+                        result["text"], result["cached"] = cached, True
+                        self._record_file(result, submitted)
+                        yield result
+                        continue
+                    if use_pool:
+                        if processes is None:
+                            processes = stack.enter_context(
+                                ProcessPoolExecutor(max_workers=config.PDF_MAX_WORKERS or None)
+                            )
+                        future = processes.submit(extract_pdf_text, path)
+                    else:
+                        future = threads.submit(extract_pdf_text, path)
+                elif result["kind"] == "image":
+                    future = threads.submit(bind(self.process_image_with_llm), path)
+                elif result["kind"] == "text":
+                    future = threads.submit(self._read_text_file, path)
+                else:
+                    result["error"] = "Unsupported file type"
+                    yield result
+                    continue
+                
+                futures[future] = (result, submitted)
+            
+            for future in as_completed(futures):
+                if cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    raise Cancelled()
+                result, submitted = futures[future]
+                try:
+                    result["text"] = future.result()
+                    if result["kind"] == "pdf":
+                        self.cache.put(result["path"], PDF_EXTRACTOR_VERSION, result["text"])
+                except Exception as e:
+                    result["error"] = str(e)
+                self._record_file(result, submitted)
+                yield result
+    
+    @staticmethod
+    def _record_file(result: Dict, submitted: float):
+        get_metrics().record(
+            f"extract_{result['kind']}", "file", submitted, time.time(), error=result["error"],
+            payload_bytes=os.path.getsize(result["path"]), text_chars=len(result["text"]),
+            cache_hits=int(result["cached"]),
+        )
+    
     def process_multiple_files(self, filepaths: List[str]) -> str:
         """Process all files and combine extracted text."""
         combined_text = []
@@ -0,0 +1,221 @@
+# utils/embedding_cache.py
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.file_lock import file_lock
+from utils.memmap_vectors import MemmapVectors
+from utils.metrics import get_metrics
+
+
+class CachedEmbeddings(MemmapVectors, Embeddings):
+    """Embeddings wrapper with an in-memory LRU and a persistent vector store.
+
+    Vectors are kept in a memory-mapped float32 ``vectors.npy`` matrix; each
+    text hash is appended to ``keys.txt`` with its row and the row's CRC32.
+    A row is written and flushed before its key, and rows whose checksum
+    does not match are ignored, so after a crash the store is simply a few
+    rows shorter. Processes sharing the directory (the app, the batch and
+    import CLIs) append under a file lock after reading what the others
+    have added, so every key points at its own row. Only texts missing from both layers reach the wrapped model,
+    in a single batched call. ``underlying`` may also be a zero-argument
+    factory, in which case the model is only built on the first cache miss.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str,
+        directory: Optional[str] = "./data/embedding_cache",
+        memory_size: int = 10000,
+    ):
+        self._underlying = underlying
+        self.namespace = namespace
+        self.memory_size = memory_size
+        self.directory = os.path.join(directory, self._safe_name(namespace)) if directory else None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._rows: Dict[str, int] = {}
+        self._vectors = None
+        # Next free row; rows are never reused
+        self._count = 0
+        # Bytes and lines of keys.txt read so far
+        self._keys_offset = 0
+        self._key_lines = 0
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load()
+
+    @property
+    def underlying(self) -> Embeddings:
+        if not isinstance(self._underlying, Embeddings):
+            with self._lock:
+                if not isinstance(self._underlying, Embeddings):
+                    self._underlying = self._underlying()
+        return self._underlying
+
+    @staticmethod
+    def _safe_name(namespace: str) -> str:
+        return "".join(c if c.isalnum() or c in "-_." else "_" for c in namespace)
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.directory, "keys.txt")
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _checksum(row: np.ndarray) -> str:
+        return f"{zlib.crc32(np.ascontiguousarray(row, dtype=np.float32).tobytes()):08x}"
+
+    def _load(self):
+        with file_lock(self._lock_path):
+            self._sync()
+
+    def _sync(self):
+        """Read the keys appended since the last call, by this or another process."""
+        self._reopen_if_replaced()
+        if self._vectors is None or not os.path.exists(self._keys_path):
+            return
+
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # A partially written last line is left for the next writer to truncate
+        data = data[:data.rfind(b"\n") + 1]
+        self._keys_offset += len(data)
+
+        for line in data.decode("utf-8").splitlines():
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) == 1:
+                # Written before rows were recorded: the line number is the row
+                key, row, checksum = parts[0], self._key_lines, None
+            else:
+                key, row, checksum = parts[0], int(parts[1]), parts[2]
+            self._key_lines += 1
+            self._count = max(self._count, row + 1)
+            if row < self._vectors.shape[0] and (checksum is None or checksum == self._checksum(self._vectors[row])):
+                self._rows[key] = row
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+
+        row = self._rows.get(key)
+        if row is not None:
+            vector = self._vectors[row].tolist()
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+
+        self.misses += 1
+        return None
+
+    def _store(self, keys: List[str], vectors: List[List[float]]):
+        for key, vector in zip(keys, vectors):
+            self._remember(key, vector)
+
+        if not self.directory or not vectors:
+            return
+
+        new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+        if not new:
+            return
+
+        with file_lock(self._lock_path):
+            self._sync()
+            new = [(key, vector) for key, vector in new if key not in self._rows]
+            if not new:
+                return
+
+            self._ensure_capacity(self._count, len(new), len(new[0][1]))
+            start = self._count
+            matrix = np.asarray([vector for _, vector in new], dtype=np.float32)
+            self._vectors[start:start + len(new)] = matrix
+            self._vectors.flush()
+
+            lines = "".join(
+                f"{key} {start + offset} {self._checksum(row)}\n"
+                for offset, ((key, _), row) in enumerate(zip(new, matrix))
+            ).encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                # Drop what a writer that crashed mid-line left behind
+                f.truncate(self._keys_offset)
+                f.write(lines)
+            self._keys_offset += len(lines)
+            self._key_lines += len(new)
+
+            for offset, (key, _) in enumerate(new):
+                self._rows[key] = start + offset
+            self._count += len(new)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with get_metrics().span("embed_documents", "embedding", items=len(texts),
+                                payload_bytes=sum(len(text) for text in texts)) as span:
+            results, misses = self._embed_documents(texts)
+            span.set(cache_misses=misses, cache_hits=len(texts) - misses)
+            return results
+
+    def _embed_documents(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        keys = [self._key(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        with self._lock:
+            missing: Dict[str, List[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._lookup(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = vector
+
+        if missing:
+            missing_keys = list(missing)
+            vectors = self.underlying.embed_documents([texts[missing[key][0]] for key in missing_keys])
+            # Round through float32 so fresh, memory and disk results are identical
+            vectors = np.asarray(vectors, dtype=np.float32).tolist()
+            with self._lock:
+                self._store(missing_keys, vectors)
+            for key, vector in zip(missing_keys, vectors):
+                for i in missing[key]:
+                    results[i] = vector
+
+        return results, sum(len(rows) for rows in missing.values())
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._rows),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
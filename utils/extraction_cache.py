@@ -0,0 +1,162 @@
+# utils/extraction_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+
+
+def file_digest(file_path: str, extractor_version: str) -> str:
+    """SHA-256 of the extractor version and the file bytes."""
+    digest = hashlib.sha256()
+    digest.update(extractor_version.encode("utf-8"))
+    digest.update(b"\0")
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """On-disk cache of text extracted from uploaded files.
+
+    One JSON file per entry under ``directory``, named by the digest of the
+    file contents and extractor version, so renamed or re-uploaded copies of
+    the same document hit the same entry. A hit refreshes the entry's mtime;
+    eviction drops entries older than ``max_age_seconds`` and then the least
+    recently used ones until the directory is under ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str = "./data/extraction_cache",
+        max_bytes: int = 100 * 1024 * 1024,
+        max_age_seconds: Optional[float] = 90 * 24 * 3600,
+        enabled: bool = True,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, file_path: str, extractor_version: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(file_digest(file_path, extractor_version))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry["text"]
+
+    def put(self, file_path: str, extractor_version: str, text: str):
+        if not self.enabled:
+            return
+
+        key = file_digest(file_path, extractor_version)
+        entry = {
+            "text": text,
+            "extractor": extractor_version,
+            "source_name": os.path.basename(file_path),
+            "created_at": time.time(),
+        }
+
+        # Write to a temp file first so concurrent readers never see a partial entry
+        temp_path = f"{self._entry_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self._entry_path(key))
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        removed = 0
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for mtime, size, path in entries:
+            expired = self.max_age_seconds is not None and now - mtime > self.max_age_seconds
+            if not expired and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                directory=config.EXTRACTION_CACHE_DIR,
+                max_bytes=config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+                max_age_seconds=config.EXTRACTION_CACHE_MAX_AGE_DAYS * 24 * 3600 if config.EXTRACTION_CACHE_MAX_AGE_DAYS > 0 else None,
+                enabled=config.EXTRACTION_CACHE_ENABLED,
+            )
+        return _cache
@@ -0,0 +1,42 @@
+# utils/fake_embeddings.py
+import hashlib
+import math
+import re
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Offline, deterministic embeddings for benchmarks and development.
+
+    Selected with ``EMBEDDING_PROVIDER=fake``. Every word is hashed to a
+    dimension and a sign (the hashing trick), so texts that share words are
+    close in cosine distance, which is enough for similarity search to
+    return sensible neighbours. ``latency`` seconds are slept per call.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,97 @@
+# utils/fake_llm.py
+import json
+import re
+import time
+from typing import Any, Callable, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    parts = []
+    for message in messages:
+        if isinstance(message.content, str):
+            parts.append(message.content)
+        else:
+            parts.extend(part.get("text", "") for part in message.content if isinstance(part, dict))
+    return "\n".join(parts)
+
+
+def default_fake_response(prompt: str) -> str:
+    """Deterministic stand-in answers for the prompts this app sends.
+
+    Task extraction turns every line of the analysed text that contains an
+    ISO date into a task due on that date; every other prompt gets an empty
+    JSON array, which callers treat as "nothing to change".
+    """
+    if "task extraction expert" in prompt and "Text to analyze:" in prompt:
+        text = prompt.split("Text to analyze:", 1)[1].split("Return ONLY", 1)[0]
+        tasks = []
+        for line in text.splitlines():
+            match = DATE_PATTERN.search(line)
+            if not match:
+                continue
+            name = line.replace(match.group(1), "").strip(" -:,.\t") or "Task"
+            tasks.append({
+                "task_name": name[:80],
+                "deadline": match.group(1),
+                "estimated_hours": 2 + len(tasks) % 3,
+                "priority": ["High", "Medium", "Low"][len(tasks) % 3],
+                "course": None,
+            })
+        return json.dumps(tasks)
+
+    if "Extract all text from this image" in prompt:
+        return "Fake OCR text"
+
+    return "[]"
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with configurable latency and canned responses.
+
+    Selected with ``LLM_PROVIDER=fake``. ``responder`` maps the prompt text
+    to the reply; ``latency`` seconds are slept per call (spread over the
+    chunks when streaming).
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.0
+    responder: Callable[[str], str] = default_fake_response
+    chunk_size: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "latency": self.latency}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        content = self.responder(_prompt_text(messages))
+        prompt_tokens = len(_prompt_text(messages)) // 4
+        completion_tokens = len(content) // 4
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content = self.responder(_prompt_text(messages))
+        chunks = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)] or [""]
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
@@ -0,0 +1,43 @@
+# utils/file_lock.py
+import os
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        while True:
+            try:
+                # LK_LOCK gives up after about ten seconds; keep waiting
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on ``path`` (created if missing), blocking until other processes release it.
+
+    Each call opens the file anew, so threads of one process exclude each
+    other as well; the lock is released if the process dies.
+    """
+    with open(path, "a+b") as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
@@ -1,32 +1,374 @@
+import asyncio
 import os
 import sys
+import random
+import threading
+import time
+import hashlib
+from concurrent.futures import Future
+from typing import Dict, Iterator, Optional
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from langchain_core.rate_limiters import BaseRateLimiter
 import config
-from dotenv import load_dotenv
-from langsmith import Client
-from langchain_groq import ChatGroq
+from utils.metrics import get_metrics
+from utils.rate_limiter import TokenBucket
+from utils.tracing import setup_tracing
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler-new"
-os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
 
-try:
-    client = Client()
-    print("LangSmith Client initialized successfully")
-except Exception as e:
-    print(f"LangSmith setup error: {e}")
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "InternalServerError", "RateLimitError")
 
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+_pending = threading.local()
 
 
-def get_llm(temperature=0, model=None):
-    if model is None:
-        model = config.GROQ_MODEL
-        
+class ModelRateLimiter(BaseRateLimiter):
+    """Request and token buckets for one model, used as the chat model's rate_limiter.
+
+    LangChain only calls the rate limiter after a response-cache miss, so
+    cached answers never wait for rate-limit capacity. The gateway passes
+    the estimated prompt tokens in and reads the time spent waiting back
+    through a thread-local.
+    """
+
+    def __init__(self):
+        self.requests = TokenBucket(config.LLM_REQUESTS_PER_MINUTE) if config.LLM_REQUESTS_PER_MINUTE > 0 else None
+        self.tokens = TokenBucket(config.LLM_TOKENS_PER_MINUTE) if config.LLM_TOKENS_PER_MINUTE > 0 else None
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire()
+        if self.tokens:
+            waited += self.tokens.acquire(getattr(_pending, "tokens", 1))
+        _pending.waited = getattr(_pending, "waited", 0.0) + waited
+        _pending.sent = True
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await asyncio.to_thread(self.acquire, blocking=blocking)
+
+
+class LLMMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.coalesced = 0
+            self.retries = 0
+            self.errors = 0
+            self.cache_hits = 0
+            self.queue_wait_seconds = 0.0
+            self.network_seconds = 0.0
+            self.tokens_in = 0
+            self.tokens_out = 0
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = max(self.requests, 1)
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "errors": self.errors,
+                "cache_hits": self.cache_hits,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+                "network_seconds": round(self.network_seconds, 3),
+                "avg_queue_wait_seconds": round(self.queue_wait_seconds / calls, 3),
+                "avg_network_seconds": round(self.network_seconds / calls, 3),
+            }
+
+
+_metrics = LLMMetrics()
+_lock = threading.Lock()
+_gateways: Dict[tuple, "LLMGateway"] = {}
+_limiters: Dict[str, ModelRateLimiter] = {}
+_http_clients: Dict[str, object] = {}
+_concurrency = None
+
+
+def _prompt_text(prompt) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    parts = []
+    for message in prompt:
+        content = getattr(message, "content", message)
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            # Multimodal content: only the text parts count; images get a flat estimate
+            for part in content:
+                if isinstance(part, dict):
+                    parts.append(part.get("text", "") if part.get("type") == "text" else " " * 4000)
+    return "\n".join(parts)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class LLMGateway:
+    """Shared, rate-limited front for one chat model configuration.
+
+    All callers of get_llm() with the same model and temperature share one
+    gateway, and all gateways for a model share its HTTP connection pool and
+    its request/token buckets. A process-wide semaphore caps concurrent
+    calls. Rate-limit and transient errors are retried with exponential
+    backoff and full jitter, and identical prompts already in flight are
+    coalesced into a single request.
+    """
+
+    def __init__(self, chat_model, model: str, temperature: float):
+        self.chat_model = chat_model
+        self.model = model
+        self.temperature = temperature
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _key(self, prompt) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.temperature}\0{prompt!r}".encode("utf-8")).hexdigest()
+
+    def invoke(self, prompt, **kwargs):
+        key = self._key(prompt)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            _metrics.add(coalesced=1)
+            return future.result()
+
+        try:
+            with get_metrics().span("llm.invoke", "llm", model=self.model,
+                                    payload_bytes=len(_prompt_text(prompt))) as span:
+                result = self._invoke_with_retries(prompt, span, **kwargs)
+                span.add(payload_bytes=len(str(result.content)))
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stream(self, prompt, **kwargs) -> Iterator[str]:
+        """Yield the response text as it arrives.
+
+        LangChain does not cache streamed calls, so the response cache is
+        consulted and filled here; streamed and invoked calls share entries.
+        Errors are only retried until the first piece of text has arrived.
+        """
+        # Recorded after the fact: a span held open across yields would leak into the caller's context
+        start = time.time()
+        attributes = {"model": self.model, "payload_bytes": len(_prompt_text(prompt))}
+
+        cache = self.chat_model.cache if isinstance(self.chat_model.cache, BaseCache) else None
+        if cache is not None:
+            cache_prompt = dumps(self.chat_model._convert_input(prompt).to_messages())
+            llm_string = self.chat_model._get_llm_string(**kwargs)
+            cached = cache.lookup(cache_prompt, llm_string)
+            if cached:
+                _metrics.add(cache_hits=1)
+                attributes.update(cache_hits=1, payload_bytes=attributes["payload_bytes"] + len(cached[0].text))
+                get_metrics().record("llm.stream", "llm", start, time.time(), **attributes)
+                yield cached[0].text
+                return
+
+        estimated_tokens = len(_prompt_text(prompt)) // 4 + 1
+        attempt = 0
+        parts = []
+
+        while True:
+            queued = time.perf_counter()
+            error = None
+            usage = None
+            with _concurrency:
+                started = time.perf_counter()
+                _pending.tokens, _pending.waited, _pending.sent = estimated_tokens, 0.0, False
+                try:
+                    for chunk in self.chat_model.stream(prompt, **kwargs):
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield chunk.content
+                except Exception as e:
+                    error = e
+                finally:
+                    self._record(queued, started, error)
+
+            if error is None:
+                break
+            try:
+                if parts:
+                    # Text has already been handed to the caller; it cannot be taken back
+                    _metrics.add(errors=1)
+                    raise error
+                attempt = self._before_retry(error, attempt)
+            except Exception as e:
+                get_metrics().record("llm.stream", "llm", start, time.time(),
+                                     error=f"{type(e).__name__}: {e}", **attributes)
+                raise
+
+        tokens_in, tokens_out = self._charge_tokens(usage, estimated_tokens)
+        attributes.update(tokens_in=tokens_in, tokens_out=tokens_out, cache_hits=0,
+                          payload_bytes=attributes["payload_bytes"] + sum(len(part) for part in parts))
+        get_metrics().record("llm.stream", "llm", start, time.time(), **attributes)
+        if cache is not None:
+            cache.update(cache_prompt, llm_string, [ChatGeneration(message=AIMessage(content="".join(parts)))])
+
+    def _invoke_with_retries(self, prompt, span, **kwargs):
+        estimated_tokens = len(_prompt_text(prompt)) // 4 + 1
+        attempt = 0
+
+        while True:
+            queued = time.perf_counter()
+            error = None
+            with _concurrency:
+                started = time.perf_counter()
+                _pending.tokens, _pending.waited, _pending.sent = estimated_tokens, 0.0, False
+                try:
+                    response = self.chat_model.invoke(prompt, **kwargs)
+                except Exception as e:
+                    error = e
+                finally:
+                    sent = self._record(queued, started, error)
+
+            if error is None:
+                if sent:
+                    tokens_in, tokens_out = self._charge_tokens(getattr(response, "usage_metadata", None), estimated_tokens)
+                    span.set(tokens_in=tokens_in, tokens_out=tokens_out, cache_hits=0)
+                else:
+                    span.set(cache_hits=1)
+                return response
+            attempt = self._before_retry(error, attempt)
+
+    def _record(self, queued: float, started: float, error: Optional[Exception]) -> bool:
+        """Account one attempt; returns whether it reached the API (i.e. missed the cache)."""
+        # Time spent in the rate limiter counts as queueing, not network
+        limiter_wait = _pending.waited
+        sent = _pending.sent
+        _metrics.add(
+            queue_wait_seconds=started - queued + limiter_wait,
+            network_seconds=time.perf_counter() - started - limiter_wait,
+            requests=1 if sent else 0,
+            cache_hits=0 if sent or error else 1,
+        )
+        return sent
+
+    def _before_retry(self, error: Exception, attempt: int) -> int:
+        """Re-raise ``error`` if it is final, otherwise sleep out the backoff and return the next attempt."""
+        if attempt >= config.LLM_MAX_RETRIES or not _is_retryable(error):
+            _metrics.add(errors=1)
+            raise error
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+        _metrics.add(retries=1)
+        print(f"LLM call failed ({type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+        time.sleep(delay)
+        return attempt + 1
+
+    def _charge_tokens(self, usage: Optional[Dict], estimated_tokens: int) -> tuple:
+        usage = usage or {}
+        tokens_in = usage.get("input_tokens", estimated_tokens)
+        tokens_out = usage.get("output_tokens", 0)
+        _metrics.add(tokens_in=tokens_in, tokens_out=tokens_out)
+
+        # Charge the real usage against the token budget
+        limiter = _limiters[self.model]
+        if limiter.tokens:
+            limiter.tokens.consume(tokens_in + tokens_out - estimated_tokens)
+        return tokens_in, tokens_out
+
+
+def _build_chat_model(model: str, temperature: float, use_cache: bool):
+    # Imported here so that importing this module stays cheap
+    from utils.llm_cache import get_response_cache
+
+    # cache=False opts out of any global langchain cache as well
+    cache = get_response_cache() if use_cache and config.LLM_CACHE_ENABLED else False
+
+    if config.LLM_PROVIDER == "fake":
+        from utils.fake_llm import FakeChatModel
+        return FakeChatModel(
+            model_name=model, latency=config.FAKE_LLM_LATENCY, cache=cache, rate_limiter=_limiters[model]
+        )
+
+    import httpx
+    from langchain_groq import ChatGroq
+
+    if model not in _http_clients:
+        _http_clients[model] = httpx.Client(
+            limits=httpx.Limits(max_connections=config.LLM_MAX_CONCURRENCY,
+                                max_keepalive_connections=config.LLM_MAX_CONCURRENCY)
+        )
+
     return ChatGroq(
         model=model,
         temperature=temperature,
         groq_api_key=config.GROQ_API_KEY,
-    )
\ No newline at end of file
+        cache=cache,
+        http_client=_http_clients[model],
+        rate_limiter=_limiters[model],
+        # Retries are handled by the gateway so they respect the shared limits
+        max_retries=0,
+    )
+
+
+def get_llm(temperature=0, model=None, use_cache=True):
+    global _concurrency
+
+    setup_tracing()
+    if model is None:
+        model = config.GROQ_MODEL
+
+    key = (model, temperature, use_cache)
+    with _lock:
+        if _concurrency is None:
+            _concurrency = threading.BoundedSemaphore(max(1, config.LLM_MAX_CONCURRENCY))
+        if model not in _limiters:
+            _limiters[model] = ModelRateLimiter()
+        if key not in _gateways:
+            _gateways[key] = LLMGateway(_build_chat_model(model, temperature, use_cache), model, temperature)
+        return _gateways[key]
+
+
+def get_llm_metrics() -> Dict:
+    return _metrics.snapshot()
@@ -0,0 +1,67 @@
+# utils/memmap_vectors.py
+import os
+
+import numpy as np
+
+
+class MemmapVectors:
+    """Mixin for stores that keep float32 rows in a memory-mapped ``vectors.npy``.
+
+    The class sets ``directory`` and ``_vectors`` (None until the first row
+    is written). The file grows by doubling: a larger copy is written next
+    to it and swapped in with ``os.replace``, so a crash while growing
+    leaves the old file intact. Several processes may share the file:
+    writers hold ``file_lock(self._lock_path)`` and call
+    ``_reopen_if_replaced`` first, so they never write to a copy another
+    process has already replaced.
+    """
+
+    directory: str
+    _vectors = None
+    _vectors_inode = None
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.npy")
+
+    @property
+    def _lock_path(self) -> str:
+        # Next to the directory, which a rewrite may replace as a whole
+        return self.directory.rstrip("/\\") + ".lock"
+
+    def _open_vectors(self):
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        self._vectors_inode = os.stat(self._vectors_path).st_ino
+
+    def _reopen_if_replaced(self):
+        """Map ``vectors.npy`` again if another process has created or grown it since it was opened."""
+        try:
+            inode = os.stat(self._vectors_path).st_ino
+        except FileNotFoundError:
+            return
+        if self._vectors is None or inode != self._vectors_inode:
+            self._vectors = None
+            self._open_vectors()
+
+    def _ensure_capacity(self, count: int, needed: int, dimension: int):
+        """Make room for ``needed`` rows after the first ``count``."""
+        if self._vectors is not None and self._vectors.shape[1] != dimension:
+            raise ValueError(
+                f"Embedding dimension changed from {self._vectors.shape[1]} to {dimension}; "
+                f"clear {self.directory}"
+            )
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if count + needed <= capacity:
+            return
+
+        new_capacity = max(1024, capacity * 2, count + needed)
+        temp_path = self._vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dimension))
+        if self._vectors is not None and count:
+            grown[:count] = self._vectors[:count]
+        grown.flush()
+        del grown
+        # The old map must be released before its file is replaced (Windows)
+        self._vectors = None
+        os.replace(temp_path, self._vectors_path)
+        self._open_vectors()
@@ -0,0 +1,272 @@
+# utils/metrics.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import config
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span attributes that are summed into Prometheus counters
+COUNTED_ATTRIBUTES = ("tokens_in", "tokens_out", "cache_hits", "cache_misses", "payload_bytes", "items")
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, attributes: Dict):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **amounts):
+        for name, amount in amounts.items():
+            self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_otel(self) -> Dict:
+        """OpenTelemetry-style JSON (the shape of an OTLP span, flattened)."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": int(self.start * 1e9),
+            "endTimeUnixNano": int((self.end or self.start) * 1e9),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class _Series:
+    __slots__ = ("count", "seconds", "buckets", "totals")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.totals: Dict[str, float] = defaultdict(float)
+
+
+class MetricsRecorder:
+    """Collects timed spans for graph nodes, LLM, embedding, Chroma and file operations.
+
+    Every finished span updates per-(kind, name) latency histograms and
+    counters (exported with ``prometheus_text``), is kept in a bounded
+    in-memory buffer for ``trace_summary``, and is appended to a JSONL span
+    file when ``spans_path`` is set. Once that file reaches
+    ``spans_max_bytes`` it is renamed to ``<spans_path>.1``, replacing the
+    previous one, so the span files never take more than twice the cap.
+    """
+
+    def __init__(self, enabled: bool = True, spans_path: Optional[str] = None,
+                 prometheus_path: Optional[str] = None, max_spans: int = 5000, spans_max_bytes: int = 0):
+        self.enabled = enabled
+        self.spans_path = spans_path
+        self.spans_max_bytes = spans_max_bytes
+        self.prometheus_path = prometheus_path
+        self._spans: deque = deque(maxlen=max_spans)
+        self._series: Dict[tuple, _Series] = defaultdict(_Series)
+        self._errors: Dict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._spans_file_lock = threading.Lock()
+
+        for path in (spans_path, prometheus_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, kind: str, trace_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """Time the enclosed block; nested spans (also in other threads, see ``bind``) become children."""
+        parent = _current_span.get()
+        trace_id = trace_id or (parent.trace_id if parent else None) or _current_trace.get() or uuid.uuid4().hex
+        span = Span(trace_id, parent.span_id if parent else None, name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            self._finish(span)
+
+    def record(self, name: str, kind: str, start: float, end: float, error: Optional[str] = None, **attributes):
+        """Add a span measured elsewhere, e.g. work done in another process."""
+        parent = _current_span.get()
+        trace_id = (parent.trace_id if parent else None) or _current_trace.get() or uuid.uuid4().hex
+        span = Span(trace_id, parent.span_id if parent else None, name, kind, attributes)
+        span.start, span.end, span.error = start, end, error
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        if not self.enabled:
+            return
+        key = (span.kind, span.name)
+        with self._lock:
+            series = self._series[key]
+            series.count += 1
+            series.seconds += span.seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if span.seconds <= bound:
+                    series.buckets[i] += 1
+            for name in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(name)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    series.totals[name] += value
+            if span.error:
+                self._errors[key] += 1
+            self._spans.append(span)
+
+        if self.spans_path:
+            self._write_span(json.dumps(span.to_otel(), default=str) + "\n")
+
+        if span.kind == "node" and self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def _write_span(self, line: str):
+        with self._spans_file_lock:
+            with open(self.spans_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                size = f.tell()
+            if self.spans_max_bytes and size >= self.spans_max_bytes:
+                os.replace(self.spans_path, f"{self.spans_path}.1")
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP scheduler_operation_seconds Wall time of scheduler operations.",
+            "# TYPE scheduler_operation_seconds histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            errors = dict(self._errors)
+
+        for (kind, name), data in series:
+            labels = f'kind="{kind}",name="{name}"'
+            for bound, count in zip(LATENCY_BUCKETS, data.buckets):
+                lines.append(f'scheduler_operation_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'scheduler_operation_seconds_bucket{{{labels},le="+Inf"}} {data.count}')
+            lines.append(f"scheduler_operation_seconds_sum{{{labels}}} {data.seconds:.6f}")
+            lines.append(f"scheduler_operation_seconds_count{{{labels}}} {data.count}")
+
+        for attribute in COUNTED_ATTRIBUTES:
+            lines.append(f"# TYPE scheduler_{attribute}_total counter")
+            for (kind, name), data in series:
+                if attribute in data.totals:
+                    lines.append(f'scheduler_{attribute}_total{{kind="{kind}",name="{name}"}} {data.totals[attribute]:g}')
+
+        lines.append("# TYPE scheduler_operation_errors_total counter")
+        for (kind, name), count in sorted(errors.items()):
+            lines.append(f'scheduler_operation_errors_total{{kind="{kind}",name="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # Written to a temporary file first so scrapers never read half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            return [span for span in self._spans if trace_id is None or span.trace_id == trace_id]
+
+    def trace_summary(self, trace_id: str) -> List[Dict]:
+        """Seconds, calls and counters per (kind, name) within one trace, slowest first."""
+        rows: Dict[tuple, Dict] = {}
+        for span in self.spans(trace_id):
+            row = rows.setdefault((span.kind, span.name), {"kind": span.kind, "name": span.name, "calls": 0, "seconds": 0.0})
+            row["calls"] += 1
+            row["seconds"] += span.seconds
+            for name in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(name)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[name] = row.get(name, 0) + value
+        for row in rows.values():
+            row["seconds"] = round(row["seconds"], 3)
+        return sorted(rows.values(), key=lambda row: row["seconds"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._series.clear()
+            self._errors.clear()
+
+
+@contextmanager
+def trace(trace_id: str):
+    """Attribute spans started inside the block (without a parent span) to ``trace_id``."""
+    token = _current_trace.set(trace_id)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+def bind(fn: Callable) -> Callable:
+    """Wrap ``fn`` so that it runs in the caller's context when submitted to a pool.
+
+    Thread pools do not carry context variables over, so without this the
+    spans opened by pool workers lose their parent and trace.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def timed(name: str, kind: str):
+    """Decorator form of ``span`` for functions timed as a whole."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_recorder: Optional[MetricsRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = MetricsRecorder(
+                enabled=config.METRICS_ENABLED,
+                spans_path=config.METRICS_SPANS_PATH or None,
+                prometheus_path=config.METRICS_PROMETHEUS_PATH or None,
+                spans_max_bytes=config.METRICS_SPANS_MAX_MB * 1024 * 1024,
+            )
+        return _recorder
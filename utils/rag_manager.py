@@ -4,37 +4,385 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import config
-from typing import List, Dict
+import hashlib
+import re
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
 import json
 from datetime import datetime
-import chromadb
-from chromadb.config import Settings
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_core.documents import Document
+from utils.metrics import get_metrics, timed
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+COLLECTION_PREFIX = "scheduler_memory"
+DEFAULT_TENANT = "default"
+
+
+def collection_name(tenant_id: Optional[str]) -> str:
+    """Collection holding one tenant's memory.
+    
+    The default tenant keeps the original collection, so existing stores
+    carry over. Other ids are reduced to the characters Chroma allows and
+    suffixed with a hash when that changed them, so ids never collide.
+    """
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return COLLECTION_PREFIX
+    safe = re.sub(r"[^a-zA-Z0-9_-]", "_", tenant_id)[:36]
+    if safe != tenant_id:
+        safe = f"{safe}-{hashlib.sha1(tenant_id.encode('utf-8')).hexdigest()[:8]}"
+    return f"{COLLECTION_PREFIX}-{safe}"
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """An ISO 8601 timestamp as naive local time; None if missing or unparseable."""
+    if not value:
+        return None
+    try:
+        stamp = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone().replace(tzinfo=None)
+    return stamp
+
+
+def _own_timestamp(record: Dict) -> Optional[str]:
+    """The record's ``timestamp`` normalised to ISO 8601, None if it has none.
+    
+    Raises ValueError if it does not parse, so that nothing is stored with
+    a time that retention and ranking cannot read.
+    """
+    value = record.get("timestamp")
+    if not value:
+        return None
+    stamp = _parse_timestamp(value)
+    if stamp is None:
+        raise ValueError(f"Unreadable timestamp {value!r}; use ISO 8601, e.g. 2025-03-14T16:00:00")
+    return stamp.isoformat()
+
+
+def _age_days(metadata: Dict, now: datetime) -> Optional[float]:
+    """Days since the entry's timestamp; None if it has none that parses."""
+    stamp = _parse_timestamp(metadata.get("timestamp"))
+    return None if stamp is None else (now - stamp).total_seconds() / 86400
+
+
+def _oldest_first(entries: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+    # Entries without a readable timestamp (e.g. from older versions) count as oldest
+    return sorted(entries, key=lambda entry: _parse_timestamp(entry[1].get("timestamp")) or datetime.min)
+
+
+def _merge_key(metadata: Dict) -> Tuple[str, str]:
+    # "Problem Set 3" and "problem set #4" of one course are the same kind of work
+    name = re.sub(r"[^a-z]+", " ", str(metadata.get("task_name", "")).lower()).strip()
+    return str(metadata.get("course", "")).strip().lower(), name
 
 
 class RAGManager:
+    """Task history and productivity patterns, kept apart per tenant.
+    
+    Every tenant (user) has its own collection in the configured vector
+    backend (see ``utils.vector_backends``), so a query only searches that
+    tenant's vectors and its latency depends on that tenant's history alone. Methods take an optional ``tenant_id``; None is the
+    default tenant. Entries with their own timestamp are keyed by a hash of
+    text and time, so importing the same history twice stores it once;
+    ``ingest`` adds many in batches. Adding beyond ``RAG_TENANT_MAX_DOCUMENTS`` compacts the
+    tenant's collection by dropping its oldest entries; ``maintain`` applies
+    the retention policies (see ``maintain_memory.py``). Retrieval ranks
+    recent entries above older ones that are about as similar.
+    """
     
     def __init__(self, persist_directory="./data/chroma_db"):
         self.persist_directory = persist_directory
         
         os.makedirs(persist_directory, exist_ok=True)
         
+        # Embeddings and the vector store are heavy to import and construct, so
+        # both are created on first use rather than when the agents are built.
+        self._embeddings = None
+        self._client = None
+        self._stores: Dict[str, object] = {}
+        self._stats = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _load_embedding_model():
+        if config.EMBEDDING_PROVIDER == "fake":
+            from utils.fake_embeddings import FakeEmbeddings
+            return FakeEmbeddings(latency=config.FAKE_EMBEDDING_LATENCY)
+        
+        from langchain_huggingface import HuggingFaceEmbeddings
+        
         print("Loading embeddings model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
         print("Embeddings model loaded")
+        return model
+    
+    @property
+    def embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                from utils.embedding_cache import CachedEmbeddings
+                
+                # The model itself is only loaded on the first cache miss
+                self._embeddings = CachedEmbeddings(
+                    self._load_embedding_model,
+                    # Fake vectors must never be served in place of real ones
+                    namespace=EMBEDDING_MODEL if config.EMBEDDING_PROVIDER != "fake" else "fake",
+                    directory=config.EMBEDDING_CACHE_DIR if config.EMBEDDING_CACHE_ENABLED else None,
+                    memory_size=config.EMBEDDING_CACHE_MEMORY_SIZE
+                )
+            return self._embeddings
+    
+    @property
+    def stats(self):
+        """Actual/estimated hours aggregates per course and task type (see ``utils.task_stats``)."""
+        with self._lock:
+            if self._stats is None:
+                from utils.task_stats import TaskStats
+                
+                self._stats = TaskStats(os.path.join(self.persist_directory, "task_stats.sqlite3"))
+            return self._stats
+    
+    def store(self, tenant_id: Optional[str] = None):
+        """The tenant's vector backend (``VECTOR_BACKEND``), opened on first use."""
+        name = collection_name(tenant_id)
+        with self._lock:
+            if name not in self._stores:
+                from utils.vector_backends import open_backend
+                
+                self._stores[name] = open_backend(
+                    config.VECTOR_BACKEND, self.persist_directory, name, self._chroma_client
+                )
+            return self._stores[name]
+    
+    def _chroma_client(self):
+        # Called with self._lock held; one client for all tenants
+        if self._client is None:
+            import chromadb
+            
+            self._client = chromadb.PersistentClient(path=self.persist_directory)
+        return self._client
+    
+    @staticmethod
+    def _document_id(text: str, timestamp: Optional[str] = None, occurrence: int = 0) -> str:
+        """Id of an entry: a hash of its text and its timestamp, or of its text and occurrence.
         
-        self.vectorstore = Chroma(
-            collection_name="scheduler_memory",
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory
-        )
+        A record that says when it happened is the same record when imported
+        again and is stored once; two completions that only differ in their
+        date stay apart. A record without a timestamp is told apart from
+        identical ones by its position among them in the source
+        (``occurrence``), so importing the same file again adds nothing
+        while repeated rows within it are all kept.
+        """
+        # ISO timestamps never start with "#"
+        key = timestamp or f"#{occurrence}"
+        return hashlib.sha256(f"{text}\0{key}".encode("utf-8")).hexdigest()[:32]
+    
+    def _add_documents(self, ids: List[str], texts: List[str], metadatas: List[Dict],
+                       tenant_id: Optional[str]) -> List[int]:
+        """Embed and store the entries whose ids the tenant does not have yet; returns the indices of those added."""
+        store = self.store(tenant_id)
+        seen = store.existing(list(set(ids)))
+        added = []
+        for index, doc_id in enumerate(ids):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                added.append(index)
         
+        if added:
+            embeddings = self.embeddings.embed_documents([texts[i] for i in added])
+            store.add([ids[i] for i in added], [texts[i] for i in added], embeddings, [metadatas[i] for i in added])
+        return added
+    
+    def _enforce_quota(self, tenant_id: Optional[str]):
+        if config.RAG_TENANT_MAX_DOCUMENTS > 0 and self.count(tenant_id) > config.RAG_TENANT_MAX_DOCUMENTS:
+            self.compact(tenant_id)
+    
+    def _search(self, queries: List[str], k: int, tenant_id: Optional[str]) -> List[List]:
+        embeddings = self.embeddings.embed_documents(queries)
+        with get_metrics().span("similarity_search", "vectorstore", items=len(queries), backend=config.VECTOR_BACKEND):
+            return self.store(tenant_id).query(embeddings, k)
     
-    def add_task_completion(self, task: Dict):
+    def count(self, tenant_id: Optional[str] = None) -> int:
+        return self.store(tenant_id).count()
+    
+    @timed("compact", "vectorstore")
+    def compact(self, tenant_id: Optional[str] = None, max_documents: Optional[int] = None) -> int:
+        """Drop the tenant's oldest entries beyond ``max_documents`` (default: the quota); returns how many."""
+        limit = config.RAG_TENANT_MAX_DOCUMENTS if max_documents is None else max_documents
+        store = self.store(tenant_id)
+        if limit <= 0 or store.count() <= limit:
+            return 0
+        
+        by_age = _oldest_first(store.entries())
+        expired = [doc_id for doc_id, _ in by_age[:len(by_age) - limit]]
+        store.delete(expired)
+        print(f"Compacted memory of tenant {tenant_id or DEFAULT_TENANT}: removed {len(expired)} oldest entries")
+        return len(expired)
+    
+    def expire(self, tenant_id: Optional[str] = None, ttl_days: Optional[int] = None,
+               now: Optional[datetime] = None) -> int:
+        """Delete entries older than ``ttl_days`` (default ``RAG_TTL_DAYS``; 0 keeps all); returns how many.
+        
+        Entries without a timestamp are kept. The task stats are not
+        touched, so estimates still reflect the expired completions.
+        """
+        ttl_days = config.RAG_TTL_DAYS if ttl_days is None else ttl_days
+        if ttl_days <= 0:
+            return 0
+        now = now or datetime.now()
+        store = self.store(tenant_id)
+        expired = [doc_id for doc_id, metadata in store.entries()
+                   if (_age_days(metadata, now) or 0) > ttl_days]
+        store.delete(expired)
+        return len(expired)
+    
+    def merge_similar(self, tenant_id: Optional[str] = None, after_days: Optional[int] = None,
+                      now: Optional[datetime] = None) -> int:
+        """Replace older completions of the same course and name by one summary each.
+        
+        Completions older than ``after_days`` (default ``RAG_MERGE_AFTER_DAYS``;
+        0 disables merging) whose names only differ in numbers and
+        punctuation, such as "Problem Set 3" and "Problem Set 4", become one
+        entry with their mean hours and a ``merged_count``. Returns how many
+        entries were removed.
+        
+        A summary is dated like its newest member, so it ranks and expires
+        as that completion would: ``expire`` removes the whole summary, older
+        members included, only once the newest has passed the TTL. With
+        merging after ``RAG_MERGE_AFTER_DAYS`` and a TTL of ``RAG_TTL_DAYS``,
+        history is kept for at most their sum.
+        """
+        after_days = config.RAG_MERGE_AFTER_DAYS if after_days is None else after_days
+        if after_days <= 0:
+            return 0
+        now = now or datetime.now()
+        store = self.store(tenant_id)
+        
+        groups: Dict[Tuple[str, str], List[Tuple[str, Dict]]] = {}
+        for doc_id, metadata in store.entries():
+            age = _age_days(metadata, now)
+            if "task_name" in metadata and age is not None and age > after_days and self._ratio(metadata):
+                groups.setdefault(_merge_key(metadata), []).append((doc_id, metadata))
+        
+        texts, metadatas, merged_ids = [], [], []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            members = _oldest_first(members)
+            newest = members[-1][1]
+            counts = [int(metadata.get("merged_count", 1)) for _, metadata in members]
+            total = sum(counts)
+            
+            def mean(field):
+                return round(sum(float(m[field]) * n for (_, m), n in zip(members, counts)) / total, 2)
+            
+            text, metadata = self._completion_document({
+                "task_name": newest["task_name"],
+                "course": newest.get("course", "General"),
+                "estimated_hours": mean("estimated_hours"),
+                "actual_hours": mean("actual_hours"),
+                "priority": newest.get("priority", "Medium"),
+                "notes": f"Summary of {total} completions from {members[0][1]['timestamp'][:10]} "
+                         f"to {newest['timestamp'][:10]}",
+                "timestamp": newest["timestamp"],
+            }, newest["timestamp"])
+            texts.append(text)
+            metadatas.append({**metadata, "merged_count": total})
+            merged_ids += [doc_id for doc_id, _ in members]
+        
+        if texts:
+            # Summaries are stored before the originals go, so an interruption loses nothing
+            ids = [self._document_id(text, metadata["timestamp"]) for text, metadata in zip(texts, metadatas)]
+            self._add_documents(ids, texts, metadatas, tenant_id)
+            store.delete(merged_ids)
+        return len(merged_ids) - len(texts)
+    
+    def cap_courses(self, tenant_id: Optional[str] = None, max_per_course: Optional[int] = None) -> int:
+        """Keep each course's newest ``max_per_course`` completions (default ``RAG_COURSE_MAX_COMPLETIONS``)."""
+        limit = config.RAG_COURSE_MAX_COMPLETIONS if max_per_course is None else max_per_course
+        if limit <= 0:
+            return 0
+        store = self.store(tenant_id)
+        
+        by_course: Dict[str, List[Tuple[str, Dict]]] = {}
+        for doc_id, metadata in store.entries():
+            if "task_name" in metadata:
+                by_course.setdefault(_merge_key(metadata)[0], []).append((doc_id, metadata))
+        
+        removed = []
+        for entries in by_course.values():
+            if len(entries) > limit:
+                entries = _oldest_first(entries)
+                removed += [doc_id for doc_id, _ in entries[:len(entries) - limit]]
+        store.delete(removed)
+        return len(removed)
+    
+    @timed("maintain", "vectorstore")
+    def maintain(self, tenant_id: Optional[str] = None, rebuild: bool = True,
+                 now: Optional[datetime] = None) -> Dict:
+        """Apply every retention policy to the tenant's memory, then rebuild its index.
+        
+        In order: TTL, merging of older similar completions, per-course caps
+        and the tenant quota. Deleting only masks entries (NumPy) or leaves
+        them in the index (Chroma), so with ``rebuild`` the collection is
+        rewritten afterwards, which keeps its size and search time bounded
+        by what is left. Meant to run offline, e.g. nightly.
+        """
+        started = time.perf_counter()
+        report = {"tenant": tenant_id or DEFAULT_TENANT, "before": self.count(tenant_id)}
+        report["expired"] = self.expire(tenant_id, now=now)
+        report["merged"] = self.merge_similar(tenant_id, now=now)
+        report["capped"] = self.cap_courses(tenant_id)
+        report["compacted"] = self.compact(tenant_id)
+        if rebuild:
+            self.store(tenant_id).rewrite()
+        report["after"] = self.count(tenant_id)
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        return report
+    
+    def tenants(self) -> List[str]:
+        """Tenants with completed tasks on record, always including the default tenant."""
+        return sorted({DEFAULT_TENANT, *self.stats.tenants()})
+    
+    def delete_tenant(self, tenant_id: str):
+        """Remove everything stored for ``tenant_id``."""
+        store = self.store(tenant_id)
+        self.stats.clear(tenant_id or DEFAULT_TENANT)
+        with self._lock:
+            store.drop()
+            self._stores.pop(collection_name(tenant_id), None)
+    
+    def rebuild_stats(self, tenant_id: Optional[str] = None) -> int:
+        """Recompute the tenant's aggregates from the stored completions; returns how many were used."""
+        ratios = []
+        for _, metadata in self.store(tenant_id).entries():
+            ratio = self._ratio(metadata)
+            if ratio is not None:
+                # A merged summary stands for that many completions
+                ratios += [ratio] * int(metadata.get("merged_count", 1))
+        
+        tenant = tenant_id or DEFAULT_TENANT
+        self.stats.clear(tenant)
+        self.stats.add_many(tenant, ratios)
+        return len(ratios)
+    
+    @staticmethod
+    def _ratio(metadata: Dict) -> Optional[Tuple[Optional[str], str, float]]:
+        """(course, task_name, actual/estimated hours) of a stored completion, None if it has no valid ratio."""
+        try:
+            ratio = float(metadata["actual_hours"]) / float(metadata["estimated_hours"])
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            return None
+        if ratio <= 0:
+            return None
+        return metadata.get("course"), metadata.get("task_name", ""), ratio
+    
+    @staticmethod
+    def _completion_document(task: Dict, timestamp: str) -> Tuple[str, Dict]:
         text = f"""
 Task: {task.get('task_name', 'Unknown')}
 Course: {task.get('course', 'General')}
@@ -45,22 +393,19 @@ Completion Status: {task.get('status', 'Completed')}
 Notes: {task.get('notes', 'None')}
 """
         
-        doc = Document(
-            page_content=text,
-            metadata={
-                "task_name": task.get('task_name', 'Unknown'),
-                "course": task.get('course', 'General'),
-                "estimated_hours": task.get('estimated_hours', 0),
-                "actual_hours": task.get('actual_hours', 0),
-                "priority": task.get('priority', 'Medium'),
-                "timestamp": datetime.now().isoformat()
-            }
-        )
-        
-        self.vectorstore.add_documents([doc])
-        print(f"Added task to memory: {task.get('task_name', 'Unknown')}")
+        metadata = {
+            "task_name": task.get('task_name', 'Unknown'),
+            "course": task.get('course', 'General'),
+            "estimated_hours": task.get('estimated_hours', 0),
+            "actual_hours": task.get('actual_hours', 0),
+            "priority": task.get('priority', 'Medium'),
+            # Imported history keeps when the task was actually completed
+            "timestamp": _own_timestamp(task) or timestamp
+        }
+        return text, metadata
     
-    def add_schedule_pattern(self, pattern: Dict):
+    @staticmethod
+    def _pattern_document(pattern: Dict, timestamp: str) -> Tuple[str, Dict]:
         text = f"""
 Time Slot: {pattern.get('time_slot', 'Unknown')}
 Day Type: {pattern.get('day_type', 'Weekday')}
@@ -69,45 +414,183 @@ Task Type Completed: {pattern.get('task_type', 'General')}
 Success Rate: {pattern.get('success_rate', 0)}%
 """
         
-        doc = Document(
-            page_content=text,
-            metadata=pattern
+        metadata = {**pattern, "timestamp": _own_timestamp(pattern) or timestamp}
+        return text, metadata
+    
+    @timed("add_task_completion", "vectorstore")
+    def add_task_completion(self, task: Dict, tenant_id: Optional[str] = None):
+        text, metadata = self._completion_document(task, datetime.now().isoformat())
+        
+        # Without a timestamp of its own the completion is dated now, so a repeat is stored again
+        if not self._add_documents([self._document_id(text, metadata["timestamp"])], [text], [metadata], tenant_id):
+            print(f"Task already in memory: {metadata['task_name']}")
+            return
+        self.stats.add(
+            tenant_id or DEFAULT_TENANT, metadata["course"], metadata["task_name"],
+            metadata["estimated_hours"], metadata["actual_hours"]
         )
+        self._enforce_quota(tenant_id)
+        print(f"Added task to memory: {metadata['task_name']}")
+    
+    @timed("add_schedule_pattern", "vectorstore")
+    def add_schedule_pattern(self, pattern: Dict, tenant_id: Optional[str] = None):
+        text, metadata = self._pattern_document(pattern, datetime.now().isoformat())
         
-        self.vectorstore.add_documents([doc])
+        if self._add_documents([self._document_id(text, metadata["timestamp"])], [text], [metadata], tenant_id):
+            self._enforce_quota(tenant_id)
         print(f"Added schedule pattern to memory")
     
-    def retrieve_similar_tasks(self, task_description: str, k: int = 3) -> List[Dict]:
-        results = self.vectorstore.similarity_search_with_score(
-            task_description, 
-            k=k
-        )
+    def ingest(
+        self,
+        records: Iterable[Dict],
+        tenant_id: Optional[str] = None,
+        kind: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """Add many completions and/or schedule patterns, ``batch_size`` at a time.
+        
+        ``records`` may be any iterable, including a generator over a large
+        file; only one batch is held at a time. ``kind`` is "completion" or
+        "pattern"; when None, records with a ``task_name`` are completions and
+        the rest patterns. Each batch is one embedding call and one write to
+        the store, and its completions update the task stats in one
+        transaction. Records already stored are skipped, so importing the
+        same records again adds nothing: those with a ``timestamp`` match on
+        content and time, those without on content and how many identical
+        records came before them in ``records``. Timestamps are stored
+        as ISO 8601; records whose timestamp does not parse are counted as
+        invalid and skipped. ``on_progress`` is called with the running totals
+        after every batch, which are also returned.
+        """
+        batch_size = max(1, batch_size or config.RAG_INGEST_BATCH_SIZE)
+        tenant = tenant_id or DEFAULT_TENANT
+        totals = {"read": 0, "added": 0, "duplicates": 0, "invalid": 0, "seconds": 0.0, "records_per_second": 0.0}
+        records = iter(records)
+        # Timestamp-less records seen so far, by the id of their first occurrence
+        occurrences: Dict[str, int] = {}
+        started = time.perf_counter()
         
-        similar_tasks = []
-        for doc, score in results:
-            similar_tasks.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "similarity_score": float(score)
+        with get_metrics().span("ingest", "vectorstore", tenant=tenant) as span:
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                
+                timestamp = datetime.now().isoformat()
+                ids, texts, metadatas = [], [], []
+                for record in batch:
+                    is_completion = (kind or ("completion" if "task_name" in record else "pattern")) == "completion"
+                    try:
+                        text, metadata = (self._completion_document if is_completion
+                                          else self._pattern_document)(record, timestamp)
+                    except ValueError as e:
+                        print(f"Skipped record: {e}")
+                        totals["invalid"] += 1
+                        continue
+                    if record.get("timestamp"):
+                        ids.append(self._document_id(text, metadata["timestamp"]))
+                    else:
+                        first = self._document_id(text)
+                        occurrence = occurrences.get(first, 0)
+                        occurrences[first] = occurrence + 1
+                        ids.append(self._document_id(text, occurrence=occurrence) if occurrence else first)
+                    texts.append(text)
+                    metadatas.append(metadata)
+                added = self._add_documents(ids, texts, metadatas, tenant_id)
+                
+                ratios = [self._ratio(metadatas[i]) for i in added if "task_name" in metadatas[i]]
+                self.stats.add_many(tenant, [ratio for ratio in ratios if ratio is not None])
+                
+                totals["read"] += len(batch)
+                totals["added"] += len(added)
+                totals["duplicates"] += len(texts) - len(added)
+                totals["seconds"] = round(time.perf_counter() - started, 3)
+                totals["records_per_second"] = round(totals["read"] / totals["seconds"], 1) if totals["seconds"] else 0.0
+                if on_progress:
+                    on_progress(dict(totals))
+            span.add(items=totals["read"])
+        
+        self._enforce_quota(tenant_id)
+        return totals
+    
+    def ingest_completions(self, tasks: Iterable[Dict], tenant_id: Optional[str] = None, **kwargs) -> Dict:
+        return self.ingest(tasks, tenant_id, kind="completion", **kwargs)
+    
+    def ingest_patterns(self, patterns: Iterable[Dict], tenant_id: Optional[str] = None, **kwargs) -> Dict:
+        return self.ingest(patterns, tenant_id, kind="pattern", **kwargs)
+    
+    @staticmethod
+    def _candidates(k: int) -> int:
+        # Extra candidates to re-rank by recency, when recency counts at all
+        return k * config.RAG_RECENCY_CANDIDATES if config.RAG_RECENCY_WEIGHT > 0 else k
+    
+    @staticmethod
+    def _rank(results: List, k: int, now: datetime) -> List[Dict]:
+        """The ``k`` best hits by distance plus a penalty for age.
+        
+        The penalty grows from 0 to ``RAG_RECENCY_WEIGHT``, reaching half of
+        it at ``RAG_RECENCY_HALF_LIFE_DAYS``; entries without a timestamp
+        get all of it. ``similarity_score`` stays the plain distance.
+        """
+        ranked = []
+        for _, content, metadata, score in results:
+            staleness = 0.0
+            if config.RAG_RECENCY_WEIGHT > 0:
+                age = _age_days(metadata, now)
+                staleness = 1.0 if age is None else 1 - 0.5 ** (max(age, 0) / config.RAG_RECENCY_HALF_LIFE_DAYS)
+            ranked.append({
+                "content": content,
+                "metadata": metadata,
+                "similarity_score": score,
+                "recency_weighted_score": score + config.RAG_RECENCY_WEIGHT * staleness
             })
+        ranked.sort(key=lambda result: result["recency_weighted_score"])
+        return ranked[:k]
+    
+    def retrieve_similar_tasks(self, task_description: str, k: int = 3, tenant_id: Optional[str] = None) -> List[Dict]:
+        results = self._search([task_description], self._candidates(k), tenant_id)[0]
+        similar_tasks = self._rank(results, k, datetime.now())
         
         print(f"Found {len(similar_tasks)} similar task(s)")
         return similar_tasks
     
-    def get_best_time_slots(self, task_type: str, k: int = 3) -> List[Dict]:
+    def retrieve_similar_tasks_batch(
+        self, task_descriptions: List[str], k: int = 3, tenant_id: Optional[str] = None
+    ) -> List[List[Dict]]:
+        """Embed all descriptions in one call and run a single multi-query search.
+        
+        Returns one list of results per description, in the same shape as
+        ``retrieve_similar_tasks``.
+        """
+        if not task_descriptions:
+            return []
+        
+        unique = list(dict.fromkeys(task_descriptions))
+        
+        now = datetime.now()
+        by_description = {}
+        for description, results in zip(unique, self._search(unique, self._candidates(k), tenant_id)):
+            by_description[description] = self._rank(results, k, now)
+        
+        print(f"Batched retrieval for {len(unique)} unique task description(s)")
+        return [by_description[description] for description in task_descriptions]
+    
+    @timed("get_best_time_slots", "vectorstore")
+    def get_best_time_slots(self, task_type: str, k: int = 3, tenant_id: Optional[str] = None) -> List[Dict]:
         query = f"Productive time for {task_type} tasks"
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        results = self._search([query], k, tenant_id)[0]
         
         time_slots = []
-        for doc, score in results:
+        for _, _, metadata, score in results:
             time_slots.append({
-                "metadata": doc.metadata,
-                "relevance_score": float(score)
+                "metadata": metadata,
+                "relevance_score": score
             })
         
         return time_slots
     
-    def seed_initial_data(self):
+    def seed_initial_data(self, tenant_id: Optional[str] = None):
         print("Seeding initial productivity data...")
         
         sample_tasks = [
@@ -149,8 +632,7 @@ Success Rate: {pattern.get('success_rate', 0)}%
             }
         ]
         
-        for task in sample_tasks:
-            self.add_task_completion(task)
+        self.ingest_completions(sample_tasks, tenant_id)
         
         sample_patterns = [
             {
@@ -183,7 +665,6 @@ Success Rate: {pattern.get('success_rate', 0)}%
             }
         ]
         
-        for pattern in sample_patterns:
-            self.add_schedule_pattern(pattern)
+        self.ingest_patterns(sample_patterns, tenant_id)
         
         print("Initial data seeded successfully!")
\ No newline at end of file
@@ -0,0 +1,46 @@
+# utils/rate_limiter.py
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``rate_per_minute`` tokens are added continuously up to ``capacity``;
+    ``acquire`` blocks until the requested amount is available and returns
+    how long it waited.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        # Requests larger than the bucket would never fit; cap them at a full bucket
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return now - started
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def consume(self, amount: float):
+        """Take tokens after the fact (e.g. actual token usage), possibly going negative."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
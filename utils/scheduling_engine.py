@@ -0,0 +1,226 @@
+# utils/scheduling_engine.py
+from bisect import insort
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import config
+from utils.time_slots import DATE_FORMAT, Schedule, format_time_slot, parse_clock, parse_date, parse_time_slot
+
+
+PRIORITY_RANK = {"High": 0, "Medium": 1, "Low": 2}
+SLOT_GRANULARITY = 15  # minutes
+NO_CAPACITY_NOTE = "(no capacity before deadline)"
+
+
+def placed_late(slot: Dict) -> bool:
+    """Whether the engine put this session after its deadline because no earlier capacity was left."""
+    return NO_CAPACITY_NOTE in str(slot.get("notes") or "")
+
+
+def _round_up(minutes: int) -> int:
+    return -(-minutes // SLOT_GRANULARITY) * SLOT_GRANULARITY
+
+
+# (start, end, weekend) in minutes; weekend None applies to every day
+Window = Tuple[int, int, Optional[bool]]
+
+
+def preferred_windows(patterns: List[Dict]) -> List[Window]:
+    """Productive time windows from RAG schedule patterns (``recommended_time_slots``), in their order."""
+    windows = []
+    for pattern in patterns or []:
+        metadata = pattern.get("metadata", pattern)
+        try:
+            start, end = parse_time_slot(str(metadata.get("time_slot", "")))
+        except ValueError:
+            continue
+        day_type = str(metadata.get("day_type", "")).lower()
+        weekend = True if day_type == "weekend" else False if day_type == "weekday" else None
+        windows.append((_round_up(start), end, weekend))
+    return windows
+
+
+class _Day:
+
+    def __init__(self, day: date, start: int, end: int, busy: Optional[List[Tuple[int, int]]] = None,
+                 windows: Optional[List[Tuple[int, int]]] = None):
+        self.day = day
+        self.cursor = start
+        self.end = end
+        self.tasks = set()
+        # Pinned and already placed slots that must be worked around, sorted by start
+        self.busy = sorted(busy or [])
+        self.windows = windows or []
+
+    def _fit(self, start: int, length: int, break_minutes: int) -> int:
+        for busy_start, busy_end in self.busy:
+            if busy_end + break_minutes <= start:
+                continue
+            if start + length + break_minutes <= busy_start:
+                break
+            start = max(start, _round_up(busy_end + break_minutes))
+        return start
+
+    def next_start(self, length: int, break_minutes: int) -> Optional[int]:
+        """Earliest start where ``length`` minutes fit, inside a preferred window when one has room; else None."""
+        for window_start, window_end in self.windows:
+            start = self._fit(max(self.cursor, window_start), length, break_minutes)
+            if start + length <= min(window_end, self.end):
+                return start
+        start = self._fit(self.cursor, length, break_minutes)
+        return start if start + length <= self.end else None
+
+    def reserve(self, start: int, end: int):
+        insort(self.busy, (start, end))
+
+
+class SchedulingEngine:
+    """Deterministic earliest-deadline-first scheduler.
+
+    Tasks are ordered by deadline, then priority, and packed into working-hours
+    windows day by day. Tasks longer than ``max_session_hours`` are split into
+    sessions, preferably on different days, and every session is followed by a
+    break. Slots never overlap, so the output is conflict-free by construction;
+    a session is only placed after its deadline if no earlier capacity exists.
+    Within a day, sessions go into the preferred windows (productive times
+    from RAG memory) first and fill the rest of the day once those are full.
+    """
+
+    def __init__(
+        self,
+        work_day_start: Optional[str] = None,
+        work_day_end: Optional[str] = None,
+        max_session_hours: Optional[float] = None,
+        break_minutes: Optional[int] = None,
+        horizon_days: Optional[int] = None,
+    ):
+        self.work_start = parse_clock(work_day_start or config.WORK_DAY_START)
+        self.work_end = parse_clock(work_day_end or config.WORK_DAY_END)
+        if self.work_end <= self.work_start:
+            raise ValueError("Working day must end after it starts")
+
+        hours = max_session_hours if max_session_hours is not None else config.MAX_SESSION_HOURS
+        self.max_session = max(SLOT_GRANULARITY, _round_up(int(hours * 60)))
+        self.max_session = min(self.max_session, self.work_end - self.work_start)
+        self.break_minutes = break_minutes if break_minutes is not None else config.BREAK_MINUTES
+        self.horizon_days = horizon_days if horizon_days is not None else config.SCHEDULE_HORIZON_DAYS
+
+    def _split_sessions(self, total_minutes: int) -> List[int]:
+        total_minutes = max(SLOT_GRANULARITY, _round_up(total_minutes))
+        count = -(-total_minutes // self.max_session)
+        # Balance session lengths instead of leaving a short tail session
+        base = _round_up(-(-total_minutes // count))
+        sessions = []
+        remaining = total_minutes
+        while remaining > 0:
+            length = min(base, remaining)
+            sessions.append(length)
+            remaining -= length
+        return sessions
+
+    def _order_tasks(self, tasks: List[Dict], fallback_deadline: date) -> List[tuple]:
+        ordered = []
+        for index, task in enumerate(tasks):
+            deadline = parse_date(task.get("deadline")) or fallback_deadline
+            rank = PRIORITY_RANK.get(task.get("priority", "Medium"), 1)
+            hours = float(task.get("estimated_hours") or 0)
+            ordered.append((deadline, rank, -hours, index, task))
+        ordered.sort(key=lambda item: item[:4])
+        return ordered
+
+    def schedule(self, tasks: List[Dict], start: Optional[datetime] = None,
+                 busy: Optional[List[Dict]] = None, preferred: Optional[List[Window]] = None) -> List[Dict]:
+        """Place ``tasks`` and return their slots.
+
+        ``busy`` are already accepted slots (in the state's slot format) that
+        stay where they are; new sessions are fitted around them and they
+        are not included in the result. ``preferred`` windows (see
+        ``preferred_windows``) are tried first, in order, on matching days.
+        """
+        start = start or datetime.now()
+        first_day = start.date()
+        fallback_deadline = first_day + timedelta(days=self.horizon_days)
+
+        pinned = Schedule.parse(busy or [])
+        busy_by_day = {
+            day: [(pinned.start[i], pinned.end[i]) for i in pinned.on_day(day)]
+            for day in pinned.days()
+        }
+        pinned_names = {
+            day: {pinned.task_names[pinned.task[i]] for i in pinned.on_day(day)}
+            for day in pinned.days()
+        }
+
+        days: List[_Day] = []
+        first_open = 0  # index of the first day that still has usable capacity
+
+        def get_day(index: int) -> _Day:
+            while len(days) <= index:
+                day = first_day + timedelta(days=len(days))
+                day_start = self.work_start
+                if day == first_day:
+                    now = _round_up(start.hour * 60 + start.minute)
+                    day_start = max(day_start, now)
+                weekend = day.weekday() >= 5
+                windows = [(window_start, window_end) for window_start, window_end, on_weekend in preferred or []
+                           if on_weekend is None or on_weekend == weekend]
+                days.append(_Day(day, day_start, self.work_end, busy_by_day.get(day.toordinal()), windows))
+                days[-1].tasks.update(pinned_names.get(day.toordinal(), ()))
+            return days[index]
+
+        slots = []
+        for deadline, _, _, _, task in self._order_tasks(tasks, fallback_deadline):
+            name = task.get("task_name", "Unnamed Task")
+            minutes = int(round(float(task.get("estimated_hours") or 0) * 60))
+            sessions = self._split_sessions(minutes)
+            last_index = max(0, (deadline - first_day).days)
+
+            for number, length in enumerate(sessions, 1):
+                index = self._find_day(get_day, first_open, last_index, length, name)
+                day = get_day(index)
+                slot_start = day.next_start(length, self.break_minutes)
+                slot_end = slot_start + length
+                day.reserve(slot_start, slot_end)
+                day.tasks.add(name)
+
+                while first_open < len(days) and days[first_open].next_start(SLOT_GRANULARITY, 0) is None:
+                    first_open += 1
+
+                notes = f"Due {deadline.strftime(DATE_FORMAT)}" if parse_date(task.get("deadline")) else "No deadline"
+                if len(sessions) > 1:
+                    notes = f"Session {number}/{len(sessions)}. " + notes
+                if day.day > deadline:
+                    notes += f" {NO_CAPACITY_NOTE}"
+
+                slots.append({
+                    "task_name": name,
+                    "date": day.day.strftime(DATE_FORMAT),
+                    "time_slot": format_time_slot(slot_start, slot_end),
+                    "duration_hours": round(length / 60, 2),
+                    "priority": task.get("priority", "Medium"),
+                    "course": task.get("course"),
+                    "notes": notes,
+                })
+
+        slots.sort(key=lambda slot: (slot["date"], slot["time_slot"]))
+        return slots
+
+    def _find_day(self, get_day, first_open: int, last_index: int, length: int, name: str) -> int:
+        # Prefer a day before the deadline that does not already hold this task,
+        # then any day before the deadline, then the first day with room after it.
+        fallback = None
+        for index in range(first_open, last_index + 1):
+            day = get_day(index)
+            if day.next_start(length, self.break_minutes) is not None:
+                if name not in day.tasks:
+                    return index
+                if fallback is None:
+                    fallback = index
+        if fallback is not None:
+            return fallback
+
+        # A fresh day past the pinned slots always fits one session, so this terminates
+        index = max(first_open, last_index + 1)
+        while get_day(index).next_start(length, self.break_minutes) is None:
+            index += 1
+        return index
@@ -0,0 +1,277 @@
+# utils/structured_output.py
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.time_slots import format_time_slot, parse_date, parse_time_slot
+
+
+PRIORITIES = {"high": "High", "medium": "Medium", "low": "Low"}
+NO_DEADLINE = "Not specified"
+
+# Validators return (item, errors): ``item`` is the cleaned element, or a
+# best-effort repair when there are errors, or None when nothing is usable.
+Validator = Callable[[Dict], Tuple[Optional[Dict], List[str]]]
+
+
+class JSONArrayStream:
+    """Incremental parser for a JSON array of objects that arrives in pieces.
+
+    ``feed`` returns the top-level objects completed by the new text as
+    ``(element, raw)`` pairs, where ``element`` is None if ``raw`` is not
+    valid JSON even after light repair. Text before the opening bracket
+    (prose, code fences) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = None
+        self.started = False
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[Optional[Dict], str]]:
+        self._text += text
+        elements = []
+
+        while self._pos < len(self._text) and not self.done:
+            char = self._text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self.started:
+                if char == "[":
+                    self.started = True
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if self._depth == 1 and char == "{":
+                    self._element_start = self._pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1 and self._element_start is not None:
+                    raw = self._text[self._element_start:self._pos + 1]
+                    elements.append((_loads_element(raw), raw))
+                    self._element_start = None
+                elif self._depth == 0:
+                    self.done = True
+
+            self._pos += 1
+
+        # Everything before an unfinished element has been consumed
+        keep_from = self._element_start if self._element_start is not None else self._pos
+        self._text = self._text[keep_from:]
+        self._pos -= keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def close(self) -> List[Tuple[Optional[Dict], str]]:
+        """Report an element cut off by the end of the response as invalid."""
+        if self._element_start is not None:
+            raw = self._text[self._element_start:]
+            self._element_start = None
+            return [(None, raw)]
+        return []
+
+
+def _loads_element(raw: str) -> Optional[Dict]:
+    for candidate in (raw, _repair_json(raw)):
+        try:
+            element = json.loads(candidate)
+        except ValueError:
+            continue
+        return element if isinstance(element, dict) else None
+    return None
+
+
+def _repair_json(raw: str) -> str:
+    """Fix the mistakes models commonly make: trailing commas and Python literals."""
+    text = re.sub(r",\s*([}\]])", r"\1", raw)
+    text = re.sub(r":\s*None\b", ": null", text)
+    text = re.sub(r":\s*True\b", ": true", text)
+    return re.sub(r":\s*False\b", ": false", text)
+
+
+def _to_hours(value) -> Optional[float]:
+    try:
+        hours = float(str(value).lower().replace("hours", "").replace("h", "").strip())
+    except (TypeError, ValueError):
+        return None
+    return hours if hours > 0 else None
+
+
+def _name(item: Dict, errors: List[str]) -> str:
+    name = item.get("task_name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append("task_name must be a non-empty string")
+        return ""
+    return name.strip()
+
+
+def _priority(value) -> str:
+    # An unknown priority is not worth a round trip; Medium is the app's default
+    return PRIORITIES.get(str(value).strip().lower(), "Medium")
+
+
+def validate_task(item: Dict) -> Tuple[Optional[Dict], List[str]]:
+    errors = []
+    name = _name(item, errors)
+    if not name:
+        return None, errors
+
+    deadline = item.get("deadline")
+    if not deadline or str(deadline).strip().lower() in ("not specified", "none", "null", "n/a"):
+        deadline = NO_DEADLINE
+    elif parse_date(str(deadline)) is None:
+        errors.append(f"deadline {deadline!r} must be YYYY-MM-DD or {NO_DEADLINE!r}")
+        deadline = NO_DEADLINE
+    else:
+        deadline = str(deadline).strip()
+
+    hours = _to_hours(item.get("estimated_hours"))
+    if hours is None:
+        errors.append("estimated_hours must be a positive number")
+        hours = 2.0
+
+    course = item.get("course")
+    return {
+        "task_name": name,
+        "deadline": deadline,
+        "estimated_hours": hours,
+        "priority": _priority(item.get("priority")),
+        "course": str(course).strip() if course else None,
+    }, errors
+
+
+def validate_slot(item: Dict) -> Tuple[Optional[Dict], List[str]]:
+    errors = []
+    name = _name(item, errors)
+
+    if parse_date(str(item.get("date", ""))) is None:
+        errors.append("date must be YYYY-MM-DD")
+    try:
+        start, end = parse_time_slot(str(item.get("time_slot", "")))
+        time_slot = format_time_slot(start, end)
+    except ValueError:
+        errors.append('time_slot must be "HH:MM - HH:MM"')
+        start = end = time_slot = None
+
+    if errors:
+        # A slot without a name, day or time cannot be placed; there is nothing to fall back to
+        return None, errors
+
+    slot = dict(item)
+    slot.update(
+        task_name=name,
+        date=str(item["date"]).strip(),
+        time_slot=time_slot,
+        # The time slot is authoritative; a disagreeing duration is recomputed, not rejected
+        duration_hours=round((end - start) / 60, 2),
+        priority=_priority(item.get("priority")),
+        notes=str(item.get("notes") or ""),
+    )
+    return slot, []
+
+
+def validate_annotation(item: Dict) -> Tuple[Optional[Dict], List[str]]:
+    index = item.get("index")
+    if isinstance(index, str) and index.isdigit():
+        index = int(index)
+    if not isinstance(index, int) or isinstance(index, bool):
+        return None, ["index must be an integer"]
+    if not isinstance(item.get("notes"), str) or not item["notes"].strip():
+        return None, ["notes must be a non-empty string"]
+    return {"index": index, "notes": item["notes"].strip()}, []
+
+
+def _parse_all(text: str) -> List[Tuple[Optional[Dict], str]]:
+    parser = JSONArrayStream()
+    return parser.feed(text) + parser.close()
+
+
+def _element_key(item: Dict):
+    return item.get("task_name", item.get("index"))
+
+
+def stream_json_array(
+    llm,
+    prompt: str,
+    validate: Validator,
+    on_item: Optional[Callable[[Dict], None]] = None,
+    repair: bool = True,
+) -> List[Dict]:
+    """Stream a JSON array answer from ``llm``, validating each element as it completes.
+
+    Valid elements are passed to ``on_item`` the moment their closing brace
+    arrives. Elements that fail to parse or validate are collected and, with
+    ``repair``, sent back in a single follow-up request; whatever is still
+    invalid afterwards falls back to the validator's best-effort repair or
+    is dropped. A malformed element therefore never discards the others.
+    """
+    parser = JSONArrayStream()
+    valid: List[Dict] = []
+    invalid: List[Tuple[str, List[str], Optional[Dict]]] = []
+
+    def handle(elements):
+        for element, raw in elements:
+            if element is None:
+                invalid.append((raw, ["not valid JSON"], None))
+                continue
+            item, errors = validate(element)
+            if errors:
+                invalid.append((raw, errors, item))
+            elif item is not None:
+                valid.append(item)
+                if on_item:
+                    on_item(item)
+
+    for text in llm.stream(prompt):
+        handle(parser.feed(text))
+    handle(parser.close())
+
+    if not invalid:
+        return valid
+
+    print(f"{len(invalid)} invalid element(s) in structured output")
+    fallbacks = [item for _, _, item in invalid if item is not None]
+
+    if repair:
+        problems = "\n".join(f"- {raw}\n  problems: {'; '.join(errors)}" for raw, errors, _ in invalid)
+        repair_prompt = f"""Your answer to the request below contained JSON array elements that were invalid.
+
+ORIGINAL REQUEST:
+{prompt}
+
+INVALID ELEMENTS:
+{problems}
+
+Return ONLY a JSON array with a corrected version of each invalid element, no other text.
+"""
+        try:
+            repaired = []
+            for element, _ in _parse_all(llm.invoke(repair_prompt).content):
+                item, errors = validate(element) if element is not None else (None, ["not valid JSON"])
+                if item is not None and not errors:
+                    repaired.append(item)
+            # A repaired element replaces the best-effort repair of the same task or slot
+            replaced = {_element_key(item) for item in repaired}
+            fallbacks = [item for item in fallbacks if _element_key(item) not in replaced] + repaired
+        except Exception as e:
+            print(f"Could not repair structured output: {e}")
+
+    for item in fallbacks:
+        valid.append(item)
+        if on_item:
+            on_item(item)
+    return valid
@@ -0,0 +1,154 @@
+# utils/task_stats.py
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# First matching pattern wins, so the more specific kinds come first
+TASK_TYPES = [
+    ("problem_set", r"problem set|pset|exercise|homework"),
+    ("lab", r"\blab\b|laboratory|experiment"),
+    ("project", r"project|milestone|implementation|prototype"),
+    ("exam", r"exam|midterm|final|quiz|test\b"),
+    ("report", r"report|essay|paper|write[- ]?up|thesis"),
+    ("reading", r"reading|read\b|chapter|literature"),
+    ("presentation", r"presentation|slides|talk\b|poster"),
+    ("assignment", r"assignment|task|submission"),
+]
+_TASK_TYPE_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in TASK_TYPES]
+
+
+def task_type(task_name: str) -> str:
+    """Coarse kind of a task, from keywords in its name; "other" if none match."""
+    for name, pattern in _TASK_TYPE_PATTERNS:
+        if pattern.search(task_name or ""):
+            return name
+    return "other"
+
+
+def _course_key(course: Optional[str]) -> str:
+    return (course or "").strip().lower() or "general"
+
+
+class Aggregate:
+    """Running count, mean and variance (Welford) of the actual/estimated hours ratio."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, ratio: float):
+        self.count += 1
+        delta = ratio - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (ratio - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+class TaskStats:
+    """Per-tenant aggregates of how long tasks took relative to their estimates.
+
+    One row per (tenant, dimension, key), where dimension is "course",
+    "type" or "course_type", kept in a small SQLite table and updated in
+    place for every completed task. Looking up a task's expected ratio is
+    then a handful of primary-key reads instead of a vector search.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # One connection shared by every thread and serialised by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS task_stats (
+                tenant TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL,
+                PRIMARY KEY (tenant, dimension, key)
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _keys(course: Optional[str], kind: str) -> Iterable[Tuple[str, str]]:
+        course = _course_key(course)
+        return [("course_type", f"{course}|{kind}"), ("course", course), ("type", kind)]
+
+    def add(self, tenant: str, course: Optional[str], task_name: str,
+            estimated_hours: float, actual_hours: float) -> bool:
+        """Fold one completed task in; returns False if the hours cannot form a ratio."""
+        try:
+            ratio = float(actual_hours) / float(estimated_hours)
+        except (TypeError, ValueError, ZeroDivisionError):
+            return False
+        if ratio <= 0:
+            return False
+        self.add_many(tenant, [(course, task_name, ratio)])
+        return True
+
+    def add_many(self, tenant: str, ratios: Iterable[Tuple[Optional[str], str, float]]):
+        """Fold in many (course, task_name, actual/estimated ratio) triples in one transaction."""
+        with self._lock:
+            aggregates: Dict[Tuple[str, str], Aggregate] = {}
+            for course, task_name, ratio in ratios:
+                for key in self._keys(course, task_type(task_name)):
+                    if key not in aggregates:
+                        row = self._conn.execute(
+                            "SELECT count, mean, m2 FROM task_stats WHERE tenant = ? AND dimension = ? AND key = ?",
+                            (tenant, *key)
+                        ).fetchone()
+                        aggregates[key] = Aggregate(*row) if row else Aggregate()
+                    aggregates[key].add(ratio)
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO task_stats (tenant, dimension, key, count, mean, m2) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(tenant, dimension, key, a.count, a.mean, a.m2) for (dimension, key), a in aggregates.items()]
+                )
+
+    def load(self, tenant: str) -> Dict[Tuple[str, str], Aggregate]:
+        """All of a tenant's aggregates, for looking up many tasks at once."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dimension, key, count, mean, m2 FROM task_stats WHERE tenant = ?",
+                (tenant,)
+            ).fetchall()
+        return {(dimension, key): Aggregate(count, mean, m2) for dimension, key, count, mean, m2 in rows}
+
+    def lookup(self, aggregates: Dict[Tuple[str, str], Aggregate], course: Optional[str], task_name: str,
+               min_count: int = 3) -> Optional[Tuple[str, Aggregate]]:
+        """Most specific aggregate with at least ``min_count`` samples, as (dimension, aggregate).
+
+        Tasks of no known type only match their course: the catch-all
+        "other" type mixes unrelated work, so such tasks are left to
+        similarity search rather than adjusted by it.
+        """
+        for key in self._keys(course, task_type(task_name)):
+            if key == ("type", "other"):
+                continue
+            aggregate = aggregates.get(key)
+            if aggregate is not None and aggregate.count >= min_count:
+                return key[0], aggregate
+        return None
+
+    def tenants(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT tenant FROM task_stats")]
+
+    def clear(self, tenant: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM task_stats WHERE tenant = ?", (tenant,))
@@ -0,0 +1,298 @@
+# utils/time_slots.py
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_clock(value: str) -> int:
+    """Parse "9:00", "09:00" or "9:00 PM" into minutes since midnight."""
+    text = value.strip().upper()
+    suffix = None
+    if text.endswith("AM") or text.endswith("PM"):
+        suffix = text[-2:]
+        text = text[:-2].strip()
+
+    if ":" in text:
+        hours, minutes = text.split(":", 1)
+    else:
+        hours, minutes = text, "0"
+    hours, minutes = int(hours), int(minutes)
+
+    if suffix == "PM" and hours != 12:
+        hours += 12
+    elif suffix == "AM" and hours == 12:
+        hours = 0
+
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time: {value!r}")
+    return hours * 60 + minutes
+
+
+def format_clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_time_slot(time_slot: str) -> Tuple[int, int]:
+    """Parse "HH:MM - HH:MM" into a (start, end) pair of minutes."""
+    parts = time_slot.replace("–", "-").split("-")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid time slot: {time_slot!r}")
+    start, end = parse_clock(parts[0]), parse_clock(parts[1])
+    if end <= start:
+        raise ValueError(f"Time slot ends before it starts: {time_slot!r}")
+    return start, end
+
+
+def format_time_slot(start: int, end: int) -> str:
+    return f"{format_clock(start)} - {format_clock(end)}"
+
+
+def format_day(day: int) -> str:
+    """Format a date ordinal (``date.toordinal()``) as YYYY-MM-DD."""
+    return date.fromordinal(day).strftime(DATE_FORMAT)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+# Schedules parsed by ``Schedule.parse``, keyed by the id of their slot list
+PARSED_CACHE_SIZE = 32
+_parsed: "OrderedDict[int, Tuple[List[Dict], int, Schedule]]" = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+class Priority(IntEnum):
+    # Same order as the scheduling engine's ranks: lower sorts first
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+
+    @classmethod
+    def parse(cls, value) -> "Priority":
+        try:
+            return cls[str(value).strip().upper()]
+        except KeyError:
+            return cls.MEDIUM
+
+    @property
+    def label(self) -> str:
+        return self.name.capitalize()
+
+
+class Slot:
+    """One schedule slot, materialised on demand from a ``Schedule``."""
+    __slots__ = ("index", "day", "start", "end", "task_name", "course", "priority", "notes")
+
+    def __init__(self, index: int, day: int, start: int, end: int, task_name: str,
+                 course: Optional[str], priority: Priority, notes: str):
+        self.index = index
+        self.day = day
+        self.start = start
+        self.end = end
+        self.task_name = task_name
+        self.course = course
+        self.priority = priority
+        self.notes = notes
+
+    @property
+    def date(self) -> str:
+        return format_day(self.day)
+
+    @property
+    def time_slot(self) -> str:
+        return format_time_slot(self.start, self.end)
+
+    @property
+    def duration_hours(self) -> float:
+        return round((self.end - self.start) / 60, 2)
+
+
+class Schedule:
+    """Compact, parsed form of the schedule slot dicts kept in the graph state.
+
+    Slots are stored as parallel arrays (day ordinal, start/end minute,
+    task id, priority), with task names and courses interned in a task
+    table, so dates and time slots are parsed once at ingest. The state
+    keeps the JSON shape; get the Schedule of a slot list with ``parse``
+    wherever the slots have to be analysed and go back with ``to_dicts``.
+    Slots whose date or time slot cannot be parsed are kept in ``invalid``
+    with the error.
+    """
+
+    KNOWN_KEYS = ("task_name", "date", "time_slot", "duration_hours", "priority", "course", "notes")
+
+    def __init__(self):
+        self.day = array("i")
+        self.start = array("H")
+        self.end = array("H")
+        self.task = array("I")
+        self.priority = array("B")
+        self.source = array("I")  # position in the list the slots came from
+        self.notes: List[str] = []
+        self.extras: Dict[int, Dict] = {}  # unknown keys, stored only for the slots that have them
+        self.task_names: List[str] = []
+        self.task_courses: List[Optional[str]] = []
+        self.invalid: List[Tuple[int, Dict, str]] = []
+        self._task_ids: Dict[Tuple[str, Optional[str]], int] = {}
+        self._by_day: Optional[Dict[int, List[int]]] = None
+
+    @classmethod
+    def parse(cls, slots: List[Dict]) -> "Schedule":
+        """``from_dicts``, cached per list, so that the nodes of a run and the UI parse a schedule once.
+
+        Schedules in the state are never changed in place: a node that
+        changes one builds a new list, which is parsed afresh. The returned
+        Schedule is shared and must not be modified.
+        """
+        if not slots:
+            return cls()
+        with _parsed_lock:
+            cached = _parsed.get(id(slots))
+            if cached is not None and cached[0] is slots and cached[1] == len(slots):
+                _parsed.move_to_end(id(slots))
+                return cached[2]
+
+        schedule = cls.from_dicts(slots)
+        with _parsed_lock:
+            # Holding the list keeps its id from being reused while cached
+            _parsed[id(slots)] = (slots, len(slots), schedule)
+            while len(_parsed) > PARSED_CACHE_SIZE:
+                _parsed.popitem(last=False)
+        return schedule
+
+    @classmethod
+    def from_dicts(cls, slots: List[Dict]) -> "Schedule":
+        schedule = cls()
+        for index, slot in enumerate(slots):
+            try:
+                start, end = parse_time_slot(slot["time_slot"])
+                day = parse_date(slot["date"])
+                if day is None:
+                    raise ValueError(f"Invalid date: {slot['date']!r}")
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                schedule.invalid.append((index, slot, str(e)))
+                continue
+
+            extras = {key: value for key, value in slot.items() if key not in cls.KNOWN_KEYS}
+            schedule.append(
+                slot.get("task_name", "Unnamed Task"), day.toordinal(), start, end,
+                Priority.parse(slot.get("priority")), slot.get("course"), slot.get("notes") or "",
+                source=index, extras=extras
+            )
+        return schedule
+
+    def append(self, task_name: str, day: int, start: int, end: int, priority: Priority = Priority.MEDIUM,
+               course: Optional[str] = None, notes: str = "", source: Optional[int] = None,
+               extras: Optional[Dict] = None):
+        key = (task_name, course)
+        task_id = self._task_ids.get(key)
+        if task_id is None:
+            task_id = self._task_ids[key] = len(self.task_names)
+            self.task_names.append(task_name)
+            self.task_courses.append(course)
+
+        if extras:
+            self.extras[len(self.day)] = extras
+        self.day.append(day)
+        self.start.append(start)
+        self.end.append(end)
+        self.task.append(task_id)
+        self.priority.append(int(priority))
+        self.source.append(len(self.source) if source is None else source)
+        self.notes.append(notes)
+        self._by_day = None
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    def __iter__(self) -> Iterator[Slot]:
+        return (self.slot(i) for i in range(len(self.day)))
+
+    def slot(self, i: int) -> Slot:
+        task_id = self.task[i]
+        return Slot(
+            self.source[i], self.day[i], self.start[i], self.end[i], self.task_names[task_id],
+            self.task_courses[task_id], Priority(self.priority[i]), self.notes[i]
+        )
+
+    def to_dict(self, i: int) -> Dict:
+        slot = self.slot(i)
+        result = {
+            "task_name": slot.task_name,
+            "date": slot.date,
+            "time_slot": slot.time_slot,
+            "duration_hours": slot.duration_hours,
+            "priority": slot.priority.label,
+            "course": slot.course,
+            "notes": slot.notes,
+        }
+        result.update(self.extras.get(i, {}))
+        return result
+
+    def to_dicts(self, include_invalid: bool = True) -> List[Dict]:
+        """Back to the state's JSON shape, in the original order."""
+        slots = [(self.source[i], self.to_dict(i)) for i in range(len(self.day))]
+        if include_invalid:
+            slots.extend((index, slot) for index, slot, _ in self.invalid)
+        return [slot for _, slot in sorted(slots, key=lambda item: item[0])]
+
+    def _index(self) -> Dict[int, List[int]]:
+        if self._by_day is None:
+            by_day: Dict[int, List[int]] = {}
+            for i, day in enumerate(self.day):
+                by_day.setdefault(day, []).append(i)
+            for positions in by_day.values():
+                positions.sort(key=lambda i: (self.start[i], self.end[i], self.source[i]))
+            self._by_day = by_day
+        return self._by_day
+
+    def days(self) -> List[int]:
+        return sorted(self._index())
+
+    def on_day(self, day: int) -> List[int]:
+        """Positions of the slots on ``day`` (an ordinal), ordered by start time."""
+        return self._index().get(day, [])
+
+    def slots_in_range(self, first: date, last: date) -> List[int]:
+        """Positions of the slots from ``first`` to ``last`` inclusive, by day and start time."""
+        days = self.days()
+        low = bisect_left(days, first.toordinal())
+        high = bisect_right(days, last.toordinal())
+        return [i for day in days[low:high] for i in self.on_day(day)]
+
+    def free_time_per_day(self, day_start: int, day_end: int) -> Dict[str, int]:
+        """Free minutes within ``[day_start, day_end)`` for every day that has slots."""
+        free = {}
+        for day, positions in self._index().items():
+            busy, covered_until = 0, day_start
+            for i in positions:
+                start, end = max(self.start[i], covered_until), min(self.end[i], day_end)
+                if end > start:
+                    busy += end - start
+                covered_until = max(covered_until, min(self.end[i], day_end))
+            free[format_day(day)] = max(0, day_end - day_start - busy)
+        return free
+
+    def load_per_task(self) -> Dict[str, float]:
+        """Scheduled hours per task name."""
+        minutes = [0] * len(self.task_names)
+        for task_id, start, end in zip(self.task, self.start, self.end):
+            minutes[task_id] += end - start
+        load: Dict[str, float] = {}
+        for task_id, total in enumerate(minutes):
+            name = self.task_names[task_id]
+            load[name] = load.get(name, 0) + round(total / 60, 2)
+        return load
@@ -1,21 +1,46 @@
 import os
+import threading
 from dotenv import load_dotenv
-from langsmith import Client
+
+_configured = False
+_client = None
+_lock = threading.Lock()
+
 
 def setup_tracing():
-    load_dotenv()
-    
-    os.environ["LANGCHAIN_TRACING_V2"] = "true"
-    os.environ["LANGCHAIN_PROJECT"] = "smart-scheduler"
-    os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
-    os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-    
-    try:
-        client = Client()
-        print("LangSmith tracing initialized")
+    """Set the LangSmith environment once per process.
+
+    Only environment variables are set here, which is all LangChain needs to
+    trace runs. The LangSmith client itself is created on first use by
+    get_langsmith_client().
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return True
+
+        load_dotenv()
+
+        os.environ["LANGCHAIN_TRACING_V2"] = os.getenv("LANGCHAIN_TRACING_V2", "true")
+        os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGCHAIN_PROJECT", "smart-scheduler")
+        os.environ["LANGCHAIN_ENDPOINT"] = os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+        os.environ["LANGCHAIN_LANGGRAPH_TRACING"] = "true"
+        if os.getenv("LANGSMITH_API_KEY"):
+            os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
+
+        _configured = True
         return True
-    except Exception as e:
-        print(f"LangSmith error: {e}")
-        return False
 
-setup_tracing()
+
+def get_langsmith_client():
+    global _client
+    setup_tracing()
+    with _lock:
+        if _client is None:
+            try:
+                from langsmith import Client
+                _client = Client()
+                print("LangSmith tracing initialized")
+            except Exception as e:
+                print(f"LangSmith error: {e}")
+        return _client
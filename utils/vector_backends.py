@@ -0,0 +1,418 @@
+# utils/vector_backends.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.file_lock import file_lock
+from utils.memmap_vectors import MemmapVectors
+
+
+# (id, text, metadata, distance) of one search hit
+Hit = Tuple[str, str, Dict, float]
+
+
+class VectorBackend(ABC):
+    """One tenant's collection of embedded texts.
+
+    Distances are squared L2 between unit vectors (``2 - 2 * cosine``),
+    Chroma's default metric, so scores mean the same with every backend.
+    """
+
+    @abstractmethod
+    def add(self, ids: List[str], texts: List[str], embeddings: List[List[float]], metadatas: List[Dict]):
+        ...
+
+    @abstractmethod
+    def query(self, embeddings: List[List[float]], k: int) -> List[List[Hit]]:
+        """The ``k`` nearest entries for every query embedding, nearest first."""
+
+    @abstractmethod
+    def entries(self) -> List[Tuple[str, Dict]]:
+        """(id, metadata) of every entry."""
+
+    @abstractmethod
+    def existing(self, ids: List[str]) -> Set[str]:
+        """Those of ``ids`` that are stored."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def rewrite(self):
+        """Rebuild the stored index from the live entries, reclaiming what deletes left behind."""
+
+    @abstractmethod
+    def drop(self):
+        """Delete the whole collection."""
+
+
+class ChromaBackend(VectorBackend):
+    """A Chroma collection; suited to large stores.
+
+    ``rewrite`` replaces the collection with a new one, which a
+    ``Collection`` handle held by another process would still miss. Each
+    rewrite therefore writes a new token to ``generation_path``, and every
+    operation first reopens the collection if the token has changed.
+    """
+
+    REWRITE_BATCH_SIZE = 1000
+
+    def __init__(self, client, name: str, generation_path: Optional[str] = None):
+        self.client = client
+        self.name = name
+        self.generation_path = generation_path
+        self._recover()
+        self._generation = self._read_generation()
+        # Embeddings are always passed in, so Chroma must not load its own model
+        self._collection = client.get_or_create_collection(name, embedding_function=None)
+
+    def _read_generation(self) -> Optional[str]:
+        if not self.generation_path:
+            return None
+        try:
+            with open(self.generation_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @property
+    def collection(self):
+        generation = self._read_generation()
+        if generation != self._generation:
+            # Rewritten by another process since this one opened it
+            self._collection = self.client.get_or_create_collection(self.name, embedding_function=None)
+            self._generation = generation
+        return self._collection
+
+    @property
+    def _rewrite_name(self) -> str:
+        # Fixed length, as the collection name may already be near Chroma's limit
+        return f"rewrite-{hashlib.sha1(self.name.encode('utf-8')).hexdigest()[:16]}"
+
+    def _recover(self):
+        names = {getattr(collection, "name", collection) for collection in self.client.list_collections()}
+        if self._rewrite_name not in names:
+            return
+        if self.name in names:
+            # Interrupted while copying: the original is intact
+            self.client.delete_collection(self._rewrite_name)
+        else:
+            # Interrupted between deleting the original and renaming the copy
+            self.client.get_collection(self._rewrite_name, embedding_function=None).modify(name=self.name)
+
+    def add(self, ids, texts, embeddings, metadatas):
+        # Chroma rejects None metadata values
+        metadatas = [{key: value for key, value in metadata.items() if value is not None} for metadata in metadatas]
+        self.collection.add(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas)
+
+    def query(self, embeddings, k):
+        collection = self.collection
+        count = collection.count()
+        if not count or not embeddings:
+            return [[] for _ in embeddings]
+        response = collection.query(
+            query_embeddings=embeddings,
+            n_results=min(k, count),
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [(doc_id, document, metadata or {}, float(distance))
+             for doc_id, document, metadata, distance in zip(ids, documents, metadatas, distances)]
+            for ids, documents, metadatas, distances in zip(
+                response["ids"], response["documents"], response["metadatas"], response["distances"]
+            )
+        ]
+
+    def entries(self):
+        stored = self.collection.get(include=["metadatas"])
+        return [(doc_id, metadata or {}) for doc_id, metadata in zip(stored["ids"], stored["metadatas"])]
+
+    def existing(self, ids):
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+    def rewrite(self):
+        """Copy the entries into a new collection and swap it in, so the index no longer holds deleted ones."""
+        collection = self.collection
+        copy = self.client.create_collection(self._rewrite_name, embedding_function=None)
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["documents", "embeddings", "metadatas"], limit=self.REWRITE_BATCH_SIZE, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            copy.add(ids=batch["ids"], documents=batch["documents"], embeddings=batch["embeddings"],
+                     metadatas=batch["metadatas"])
+            offset += len(batch["ids"])
+
+        self.client.delete_collection(self.name)
+        copy.modify(name=self.name)
+        self._collection = copy
+
+        if self.generation_path:
+            self._generation = uuid.uuid4().hex
+            with open(self.generation_path, "w", encoding="utf-8") as f:
+                f.write(self._generation)
+
+    def drop(self):
+        self.client.delete_collection(self.name)
+
+
+class NumpyBackend(MemmapVectors, VectorBackend):
+    """Brute-force search over an in-process float32 matrix; fastest for small and medium stores.
+
+    Unit-normalised vectors are kept in a memory-mapped ``vectors.npy``
+    that grows by doubling; ids, texts and metadata are appended to
+    ``records.jsonl``. A row is written and flushed before its record, so a
+    crash only loses the entries being added. Deletes are appended as
+    tombstones and the row is masked; ``rewrite`` drops them from disk.
+    A search is one matrix product and an ``argpartition`` per query.
+
+    Several processes may write to one store (the app,
+    ``ingest_history.py`` and ``maintain_memory.py``): every write and
+    rewrite holds a file lock next to the directory and first applies the
+    records the others have appended, so rows are allocated from the files
+    rather than from a stale count. Reads check with one ``stat`` whether
+    ``records.jsonl`` has grown or been replaced by a rewrite and catch up
+    if so, so a long-lived instance never serves entries a rewrite removed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._reset()
+        os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+        # Bytes of records.jsonl applied so far, and which file they came from
+        self._records_offset = 0
+        self._records_inode = None
+
+    @property
+    def _records_path(self) -> str:
+        return os.path.join(self.directory, "records.jsonl")
+
+    def _load(self):
+        with file_lock(self._lock_path):
+            # A rewrite interrupted between its two renames leaves the old copy
+            if not os.path.exists(self.directory) and os.path.exists(self.directory + ".old"):
+                os.replace(self.directory + ".old", self.directory)
+            os.makedirs(self.directory, exist_ok=True)
+            self._sync()
+
+    def _sync(self):
+        """Apply the records appended since the last call, by this or another process; hold the file lock."""
+        try:
+            inode = os.stat(self._records_path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self._records_inode:
+            # Rewritten or dropped by another process: start over from the files
+            self._reset()
+            self._records_inode = inode
+        self._reopen_if_replaced()
+        if self._vectors is None or inode is None:
+            return
+
+        with open(self._records_path, "rb") as f:
+            f.seek(self._records_offset)
+            data = f.read()
+        # A partially written last line from a crash is truncated by the next write
+        data = data[:data.rfind(b"\n") + 1]
+        self._records_offset += len(data)
+
+        first_new = len(self._ids)
+        dead = []
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "deleted" in record:
+                dead.extend(self._rows.pop(doc_id) for doc_id in record["deleted"] if doc_id in self._rows)
+            elif record["row"] == len(self._ids) and record["row"] < self._vectors.shape[0]:
+                if record["id"] in self._rows:
+                    dead.append(self._rows[record["id"]])
+                self._append_record(record["id"], record["text"], record["metadata"])
+
+        self._alive = np.concatenate([self._alive, np.ones(len(self._ids) - first_new, dtype=bool)])
+        self._alive[dead] = False
+
+    def _append_record(self, doc_id: str, text: str, metadata: Dict):
+        self._rows[doc_id] = len(self._ids)
+        self._ids.append(doc_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+
+    def _append_lines(self, lines: List[Dict]):
+        data = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        with open(self._records_path, "ab") as f:
+            # Drop what a writer that crashed mid-line left behind
+            f.truncate(self._records_offset)
+            f.write(data)
+        self._records_offset += len(data)
+        self._records_inode = os.stat(self._records_path).st_ino
+
+    def _refresh(self):
+        """Catch up with other processes before a read; one ``stat`` when nothing changed."""
+        try:
+            stat = os.stat(self._records_path)
+            current = (stat.st_ino, stat.st_size) == (self._records_inode, self._records_offset)
+        except FileNotFoundError:
+            current = self._records_inode is None
+        if not current:
+            with file_lock(self._lock_path):
+                self._sync()
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def add(self, ids, texts, embeddings, metadatas):
+        if not ids:
+            return
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            self._add(ids, texts, embeddings, metadatas)
+
+    def _add(self, ids, texts, embeddings, metadatas):
+        matrix = self._normalize(embeddings)
+
+        self._ensure_capacity(len(self._ids), len(ids), matrix.shape[1])
+        start = len(self._ids)
+        self._vectors[start:start + len(ids)] = matrix
+        self._vectors.flush()
+
+        self._append_lines([
+            {"id": doc_id, "row": start + offset, "text": text, "metadata": metadata}
+            for offset, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+        ])
+
+        dead = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            self._append_record(doc_id, text, metadata)
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+        self._alive[dead] = False
+
+    def query(self, embeddings, k):
+        if not embeddings:
+            return []
+        queries = self._normalize(embeddings)
+
+        with self._lock:
+            self._refresh()
+            alive = len(self._rows)
+            if not alive:
+                return [[] for _ in embeddings]
+            similarities = queries @ self._vectors[:len(self._ids)].T
+            similarities[:, ~self._alive] = -np.inf
+            k = min(k, alive)
+
+            # Unordered top k per query, then only those k are sorted
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            results = []
+            for row, candidates in enumerate(top):
+                ordered = candidates[np.argsort(-similarities[row, candidates])]
+                results.append([
+                    (self._ids[i], self._texts[i], self._metadatas[i], float(2 - 2 * similarities[row, i]))
+                    for i in ordered
+                ])
+            return results
+
+    def entries(self):
+        with self._lock:
+            self._refresh()
+            return [(self._ids[row], self._metadatas[row]) for row in self._rows.values()]
+
+    def existing(self, ids):
+        with self._lock:
+            self._refresh()
+            return {doc_id for doc_id in ids if doc_id in self._rows}
+
+    def delete(self, ids):
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            rows = [(doc_id, self._rows.pop(doc_id)) for doc_id in ids if doc_id in self._rows]
+            if not rows:
+                return
+            self._append_lines([{"deleted": [doc_id for doc_id, _ in rows]}])
+            for _, row in rows:
+                self._alive[row] = False
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def rewrite(self):
+        """Rewrite the files without deleted entries, swapping the directory in when complete.
+
+        Other processes notice the new ``records.jsonl`` on their next read
+        or write and reload it.
+        """
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            for leftover in (self.directory + ".rewrite", self.directory + ".old"):
+                shutil.rmtree(leftover, ignore_errors=True)
+
+            keep = sorted(self._rows.values())
+            rewritten = NumpyBackend(self.directory + ".rewrite")
+            if keep:
+                rewritten._add(
+                    [self._ids[row] for row in keep], [self._texts[row] for row in keep],
+                    self._vectors[keep], [self._metadatas[row] for row in keep]
+                )
+            rewritten._vectors = None
+            os.remove(rewritten._lock_path)
+
+            self._vectors = None
+            os.replace(self.directory, self.directory + ".old")
+            os.replace(rewritten.directory, self.directory)
+            shutil.rmtree(self.directory + ".old", ignore_errors=True)
+
+            self._reset()
+            self._sync()
+
+    def drop(self):
+        with self._lock, file_lock(self._lock_path):
+            self._reset()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def open_backend(kind: str, persist_directory: str, name: str, chroma_client_factory=None) -> VectorBackend:
+    """Backend ``kind`` ("chroma" or "numpy") for collection ``name`` under ``persist_directory``."""
+    if kind == "numpy":
+        return NumpyBackend(os.path.join(persist_directory, "numpy", name))
+    if kind == "chroma":
+        return ChromaBackend(chroma_client_factory(), name, os.path.join(persist_directory, f"{name}.generation"))
+    raise ValueError(f"Unknown vector backend {kind!r}; use 'chroma' or 'numpy'")
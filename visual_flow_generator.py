@@ -1,10 +1,10 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
 import config
-from collections import defaultdict
+from utils.time_slots import Schedule, format_day
 
 def get_gemini_flash():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    
     return ChatGoogleGenerativeAI(
         model="gemini-2.5-flash",
         google_api_key=config.GOOGLE_API_KEY,
@@ -12,11 +12,11 @@ def get_gemini_flash():
     )
 
 def generate_mermaid_flowchart(schedule_data):
+    from langchain_core.prompts import ChatPromptTemplate
+    
     llm = get_gemini_flash()
     
-    schedule_by_date = defaultdict(list)
-    for slot in schedule_data:
-        schedule_by_date[slot['date']].append(slot)
+    slots = Schedule.parse(schedule_data)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are an expert at creating clean, organized Mermaid flowcharts with efficient space usage."),
@@ -43,10 +43,10 @@ Return ONLY the Mermaid syntax starting with 'graph LR', no explanations or mark
     chain = prompt | llm
     
     schedule_text = ""
-    for date in sorted(schedule_by_date.keys()):
-        schedule_text += f"\n{date}:\n"
-        for slot in schedule_by_date[date]:
-            schedule_text += f"  - {slot['time_slot']}: {slot['task_name']} (Priority: {slot['priority']}, {slot['duration_hours']}h)\n"
+    for day in slots.days():
+        schedule_text += f"\n{format_day(day)}:\n"
+        for slot in map(slots.slot, slots.on_day(day)):
+            schedule_text += f"  - {slot.time_slot}: {slot.task_name} (Priority: {slot.priority.label}, {slot.duration_hours}h)\n"
     
     response = chain.invoke({"schedule": schedule_text})
     